@@ -5,6 +5,8 @@ from ctoybox import Toybox, Input
 from random import random, seed, randint
 
 import agents
+import agents.batch
+from agents.pool import make_agent
 import toybox
 #from agents import breakout
 
@@ -14,37 +16,43 @@ parser.add_argument('--agentclass',                             required=True, h
 parser.add_argument('--game',                                   required=True, help='The name of the game.')
 parser.add_argument('--maxsteps',   default=1e7,      type=int,                help='The maximum number of steps to run.')
 parser.add_argument('--seed',                         type=int)
+parser.add_argument('--seeds',                        type=int, nargs='+',     help='Run each of these seeds; output for each goes in its own directory.')
+parser.add_argument('--seed-file',  nargs='?',        const='resources/seeds.txt',
+                                                                               help='Run every seed listed in this file (default: resources/seeds.txt).')
+parser.add_argument('--workers',    default=os.cpu_count(), type=int,          help='Number of processes used with --seeds/--seed-file.')
+parser.add_argument('--format',     default='files',  choices=['files', 'trajectory', 'replay'],
+                                                                               help='Write a .png and .json per frame, a single .traj file per run, or a .replay file of keyframes.')
+parser.add_argument('--action-log', default='text',   choices=['text', 'binary'],
+                                                                               help='Write actions as text (.act) or as one byte per action (.actb).')
+parser.add_argument('--keyframe-interval', default=64, type=int,               help='With --format replay, store every this many states.')
+parser.add_argument('--writers',    default=0,        type=int,                help='Number of background threads writing frames and states (0 writes synchronously).')
+parser.add_argument('--profile',    action='store_true',                       help='Time each phase of a step; the summary is printed when the run ends.')
+parser.add_argument('--startstate',                                            help='A .json state, or a .traj or .replay file (see --startframe), to start from.')
+parser.add_argument('--startframe', default=1,        type=int,                help='The frame number to start from when --startstate is a .traj file.')
 args = parser.parse_args()
 
 game_lower = args.game.lower()
 
-with Toybox(game_lower) as tb:
-    importlib.import_module('agents.' + game_lower + '.' + args.agentclass.lower())
-    importlib.import_module('toybox.interventions.' + game_lower)
-
-    # First reset the random seed
-    if args.seed:
-        tb.set_seed(args.seed)
-        tb.new_game()
-
-    # Run with only one life
-    intervener = toybox.interventions.get_intervener(game_lower)
-    with intervener(tb) as intervention:
-        intervention.game.lives = 0    
+if args.seeds or args.seed_file:
+    seeds = args.seeds or agents.batch.read_seeds(args.seed_file)
+    agents.batch.run_seeds(game_lower, args.agentclass, seeds, args.output, args.maxsteps, args.workers,
+        output_format=args.format, writers=args.writers, action_log=args.action_log, profile=args.profile,
+        keyframe_interval=args.keyframe_interval, startstate=args.startstate, startframe=args.startframe)
+    sys.exit(0)
 
+with Toybox(game_lower) as tb:
+    # Agents draw from their own streams; this covers library code that uses the module-level random.
+    if args.seed: seed(args.seed)
+    agent = make_agent(game_lower, args.agentclass, args.seed, tb)
     path = args.output + (os.sep + str(args.seed) if args.seed else '')
-
-    if game_lower == 'breakout':
-        # Need to get the ball (i.e., start the game)
-        input = Input()
-        input.button1 = True
-        tb.apply_action(input)
-
-
-    agent_str = 'agents.' + game_lower + '.' + args.agentclass.lower() + '.' + args.agentclass
-    agent = eval(agent_str)(tb)
-
-    if args.seed:
-        agent.reset_seed(args.seed)
-
-    agent.play(path, args.maxsteps)
\ No newline at end of file
+    agent.output_format = args.format
+    agent.action_log_format = args.action_log
+    agent.keyframe_interval = args.keyframe_interval
+    if args.writers > 0:
+        agent.use_async_output(workers=args.writers)
+    if args.profile:
+        agent.use_profiler()
+
+    startstate = agents.batch.read_start_state(args.startstate, args.startframe)
+    agent.play(path, args.maxsteps, startstate=startstate)
+    agent.close_writer()
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""Compact binary action logs (``.actb``).
+
+A log is a small header (agent name, seed, action_repeat and the code
+encoding) followed by one uint8 per action, so a log can be memory-mapped
+and whole sweeps loaded as NumPy arrays. Codes use one of two encodings:
+
+* ``ALE``: the ALE action number, as returned by deep agents.
+* ``INPUT``: a bitmask over the buttons of a ``ctoybox.Input``.
+
+``NO_ACTION`` marks a missing action (the ``None`` that ends a run).
+"""
+import os
+import struct
+
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy
+
+from ctoybox import Input
+from toybox.envs.atari.constants import ACTION_MEANING
+
+MAGIC = b'TBXACT01'
+VERSION = 1
+EXTENSION = '.actb'
+
+ALE = 0
+INPUT = 1
+
+NO_ACTION = 255
+
+# Input buttons, in the order action_to_string checks them.
+INPUT_BUTTONS = ('left', 'right', 'up', 'down', 'button1', 'button2')
+INPUT_BITS = {button: 1 << i for i, button in enumerate(INPUT_BUTTONS)}
+
+_ALE_CODES = {meaning: code for code, meaning in ACTION_MEANING.items()}
+
+_HEADER = struct.Struct('<8sBBHqH')
+
+
+class ActionLog(NamedTuple):
+    agent: str
+    seed: Optional[int]
+    action_repeat: int
+    encoding: int
+    codes: numpy.ndarray
+
+
+def input_to_bitmask(action: Input) -> int:
+    return sum(bit for button, bit in INPUT_BITS.items() if getattr(action, button))
+
+
+def bitmask_to_input(code: int) -> Input:
+    return Input(**{button: bool(code & bit) for button, bit in INPUT_BITS.items()})
+
+
+def bitmask_to_string(code: int) -> str:
+    for button in INPUT_BUTTONS:
+        if code & INPUT_BITS[button]:
+            return button
+    return 'noop'
+
+
+def encode_actions(actions: Sequence[Union[Input, int, str, None]]) -> Tuple[numpy.ndarray, int]:
+    """Returns the codes for ``actions`` and the encoding they use."""
+    present = [a for a in actions if a is not None]
+    if all(type(a) == int for a in present):
+        encoding = ALE
+        codes = [NO_ACTION if a is None else a for a in actions]
+    else:
+        encoding = INPUT
+        codes = [NO_ACTION if a is None else _to_bitmask(a) for a in actions]
+    return numpy.asarray(codes, dtype=numpy.uint8), encoding
+
+
+def _to_bitmask(action: Union[Input, int, str]) -> int:
+    if isinstance(action, Input):
+        return input_to_bitmask(action)
+    if type(action) == int:
+        return _ale_to_bitmask(action)
+    if action in _ALE_CODES:
+        return _ale_to_bitmask(_ALE_CODES[action])
+    if action in ('', 'noop'):
+        return 0
+    if action == 'fire':
+        return INPUT_BITS['button1']
+    return INPUT_BITS[action]
+
+
+def _ale_to_bitmask(action: int) -> int:
+    meaning = ACTION_MEANING[action].lower()
+    code = INPUT_BITS['button1'] if 'fire' in meaning else 0
+    for button in ('left', 'right', 'up', 'down'):
+        if button in meaning:
+            code |= INPUT_BITS[button]
+    return code
+
+
+def code_to_string(code: int, encoding: int) -> str:
+    """The line ``Agent.save_actions`` writes to a text .act file for this action."""
+    if code == NO_ACTION:
+        return 'noop'
+    return ACTION_MEANING[code] if encoding == ALE else bitmask_to_string(code)
+
+
+def codes_from_strings(lines: Iterable[str]) -> Tuple[numpy.ndarray, int]:
+    """Parses the lines of a text .act file.
+
+    Deep agents log ALE names ('NOOP', 'RIGHTFIRE', ...), where the lowercase
+    'noop' can only be the missing final action.
+    """
+    lines = [line.strip() for line in lines]
+    ale = [line for line in lines if line != 'noop']
+    if ale and all(line in _ALE_CODES for line in ale):
+        codes = [NO_ACTION if line == 'noop' else _ALE_CODES[line] for line in lines]
+        return numpy.asarray(codes, dtype=numpy.uint8), ALE
+    return encode_actions(lines)
+
+
+def _header_size(agent: str) -> int:
+    size = _HEADER.size + len(agent.encode('utf-8'))
+    return size + (-size % 8)
+
+
+def write_action_log(filename: str, codes: Union[numpy.ndarray, Sequence[int]], encoding: int, agent='', seed=None, action_repeat=1):
+    name = agent.encode('utf-8')
+    header = _HEADER.pack(MAGIC, VERSION, encoding, action_repeat, -1 if seed is None else seed, len(name)) + name
+    with open(filename, 'wb') as f:
+        f.write(header + b'\0' * (_header_size(agent) - len(header)))
+        f.write(numpy.asarray(codes, dtype=numpy.uint8).tobytes())
+
+
+def _parse_header(data: bytes) -> Tuple[str, Optional[int], int, int, int]:
+    magic, version, encoding, action_repeat, seed, name_len = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a binary action log')
+    if version != VERSION:
+        raise ValueError('Unsupported action log version: {}'.format(version))
+    agent = bytes(data[_HEADER.size:_HEADER.size + name_len]).decode('utf-8')
+    return agent, None if seed < 0 else seed, action_repeat, encoding, _header_size(agent)
+
+
+def read_action_log(source: Union[str, bytes], mmap=True) -> ActionLog:
+    """Reads a log from a filename (memory-mapped by default) or from its bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        agent, seed, action_repeat, encoding, offset = _parse_header(source)
+        codes = numpy.frombuffer(source, dtype=numpy.uint8, offset=offset)
+        return ActionLog(agent, seed, action_repeat, encoding, codes)
+
+    with open(source, 'rb') as f:
+        agent, seed, action_repeat, encoding, offset = _parse_header(f.read(_HEADER.size + 2**16))
+    if mmap and os.path.getsize(source) > offset:
+        codes = numpy.memmap(source, dtype=numpy.uint8, mode='r', offset=offset)
+    else:
+        codes = numpy.fromfile(source, dtype=numpy.uint8)[offset:]
+    return ActionLog(agent, seed, action_repeat, encoding, codes)
+
+
+def load_action_logs(filenames: Sequence[str]) -> Tuple[numpy.ndarray, numpy.ndarray, List[ActionLog]]:
+    """Loads many logs at once.
+
+    Returns all codes concatenated into one array, the offsets at which each
+    log starts (with a final entry for the total length, so log ``i`` is
+    ``codes[offsets[i]:offsets[i+1]]``), and the individual logs.
+    """
+    logs = [read_action_log(f) for f in filenames]
+    offsets = numpy.zeros(len(logs) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(log.codes) for log in logs], out=offsets[1:])
+    codes = numpy.concatenate([log.codes for log in logs]) if logs else numpy.zeros(0, dtype=numpy.uint8)
+    return codes, offsets, logs
+
+
+def act_to_binary(act_file: str, out_file: Optional[str] = None, agent: Optional[str] = None, seed=None, action_repeat=1) -> str:
+    """Converts a text .act file; the agent name defaults to the file's base name."""
+    out_file = out_file or os.path.splitext(act_file)[0] + EXTENSION
+    agent = agent or os.path.splitext(os.path.basename(act_file))[0]
+    with open(act_file, 'r') as f:
+        codes, encoding = codes_from_strings(f.readlines())
+    write_action_log(out_file, codes, encoding, agent, seed, action_repeat)
+    return out_file
+
+
+def binary_to_act(log_file: str, out_file: Optional[str] = None) -> str:
+    out_file = out_file or os.path.splitext(log_file)[0] + '.act'
+    log = read_action_log(log_file)
+    with open(out_file, 'w') as f:
+        for code in log.codes:
+            f.write(code_to_string(int(code), log.encoding) + '\n')
+    return out_file
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert between text (.act) and binary (.actb) action logs.')
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--action_repeat', default=1, type=int)
+    args = parser.parse_args()
+
+    for f in args.files:
+        if f.endswith(EXTENSION):
+            print(binary_to_act(f))
+        else:
+            print(act_to_binary(f, seed=args.seed, action_repeat=args.action_repeat))
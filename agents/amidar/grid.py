@@ -0,0 +1,114 @@
+"""A NumPy view of an Amidar board.
+
+``TileGrid`` keeps the board's tile tags as a (height, width) array of small
+integer codes, plus the player's and enemies' tile coordinates, so agents
+and analyses can ask board-wide questions (which tiles are unpainted, how
+much is painted, how far things are) with array operations rather than by
+walking the intervention's tile objects.
+
+Tiles are (tx, ty) throughout, as ``TilePoint``; arrays are indexed [ty, tx].
+"""
+from typing import Any, Dict, Optional
+
+import numpy
+
+from ctoybox import Toybox
+
+
+# Tile tags in code order; the codes are the array's values.
+TAGS = ['Empty', 'Unpainted', 'ChaseMarker', 'Painted']
+EMPTY, UNPAINTED, CHASE_MARKER, PAINTED = range(len(TAGS))
+CODES = {tag: code for code, tag in enumerate(TAGS)}
+
+
+def manhattan(a, b) -> numpy.ndarray:
+    """Tile distances between (..., 2) arrays of (tx, ty), broadcast against each other."""
+    return numpy.abs(numpy.asarray(a) - numpy.asarray(b)).sum(axis=-1)
+
+
+class TileGrid(object):
+
+    def __init__(self, toybox: Toybox):
+        self.toybox = toybox
+        self.tags = numpy.zeros((0, 0), dtype=numpy.uint8)
+        # The JSON rows the tags were last read from; unchanged rows are skipped on update.
+        self._rows = []
+        self.player = numpy.zeros(2, dtype=numpy.int64)
+        self.enemies = numpy.zeros((0, 2), dtype=numpy.int64)
+
+    @property
+    def width(self) -> int:
+        return self.tags.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.tags.shape[0]
+
+    def update(self, state: Optional[Dict[str, Any]] = None) -> 'TileGrid':
+        """Refreshes the grid from ``state`` (by default, the toybox's current state JSON)."""
+        if state is None:
+            state = self.toybox.state_to_json()
+        rows = state['board']['tiles']
+        shape = (len(rows), len(rows[0]) if rows else 0)
+        if self.tags.shape != shape:
+            self.tags = numpy.zeros(shape, dtype=numpy.uint8)
+            self._rows = [None] * len(rows)
+        for ty, row in enumerate(rows):
+            if row != self._rows[ty]:
+                self.tags[ty] = [CODES[tag] for tag in row]
+                self._rows[ty] = row
+        self.player = self.tile_of(state['player']['position'])
+        self.enemies = numpy.array([self.tile_of(enemy['position']) for enemy in state['enemies']],
+                                   dtype=numpy.int64).reshape(-1, 2)
+        return self
+
+    def tile_of(self, position: Dict[str, int]) -> numpy.ndarray:
+        """(tx, ty) of a world position, as the game computes it."""
+        tp = self.toybox.query_state_json('world_to_tile', position)
+        return numpy.array([tp['tx'], tp['ty']], dtype=numpy.int64)
+
+    def route_ids(self, tiles) -> numpy.ndarray:
+        """Route ids (see tile_to_route_id) of (..., 2) tiles."""
+        tiles = numpy.asarray(tiles)
+        return self.width * tiles[..., 1] + tiles[..., 0]
+
+    def track(self) -> numpy.ndarray:
+        """Mask of the tiles that can be walked on (everything not Empty)."""
+        return self.tags != EMPTY
+
+    def painted(self) -> numpy.ndarray:
+        return self.tags == PAINTED
+
+    def unpainted(self) -> numpy.ndarray:
+        """Mask of the track tiles still to paint (chase markers included)."""
+        return (self.tags == UNPAINTED) | (self.tags == CHASE_MARKER)
+
+    def tiles(self, mask: numpy.ndarray) -> numpy.ndarray:
+        """(n, 2) tiles where ``mask`` is set, in row-major order."""
+        return numpy.argwhere(mask)[:, ::-1]
+
+    def painted_fraction(self) -> float:
+        track = numpy.count_nonzero(self.track())
+        return numpy.count_nonzero(self.painted()) / track if track else 0.
+
+    def player_distances(self, tiles) -> numpy.ndarray:
+        """Tile distances from the player to each of ``tiles``."""
+        return manhattan(tiles, self.player)
+
+    def enemy_distances(self) -> numpy.ndarray:
+        """Tile distance from the player to each enemy."""
+        return manhattan(self.enemies, self.player)
+
+    def nearest(self, mask: numpy.ndarray) -> Optional[numpy.ndarray]:
+        """The tile in ``mask`` closest to the player, or None if ``mask`` is empty."""
+        tiles = self.tiles(mask)
+        if not len(tiles):
+            return None
+        return tiles[self.player_distances(tiles).argmin()]
+
+    def random_tile(self, rng, mask: numpy.ndarray) -> Optional[numpy.ndarray]:
+        """A uniformly chosen tile in ``mask`` (``rng`` is a random.Random), or None if it is empty."""
+        tiles = self.tiles(mask)
+        if not len(tiles):
+            return None
+        return tiles[rng.randrange(len(tiles))]
@@ -0,0 +1,119 @@
+"""Routes over an Amidar board's junction graph.
+
+``JunctionRoutes`` turns a ``BoardIndex`` into what a walker needs at each
+junction: its neighbours as adjacency lists (CSR), and an all-pairs
+shortest-path table of tile distances and next hops, computed once per
+board. ``toward_unpainted`` uses them to head for the nearest segment that
+still has unpainted tiles.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy
+
+from .utils import BoardIndex
+
+
+class JunctionRoutes(object):
+
+    def __init__(self, index: BoardIndex, width: int):
+        self.index = index
+        self.width = width
+        n = len(index.junction_id_to_tile)
+        tiles = numpy.array([index.junction_id_to_tile[i] for i in range(n)], dtype=numpy.int64).reshape(-1, 2)
+        # Route id (see tile_to_route_id) of each junction.
+        self.route_ids = width * tiles[:, 1] + tiles[:, 0]
+        self.junction_of_route = {int(rid): i for i, rid in enumerate(self.route_ids)}
+
+        # CSR adjacency; each row's neighbours are in ascending id order, as adj_mat's nonzeros.
+        rows, cols = numpy.nonzero(index.adj_mat)
+        self.indptr = numpy.concatenate([[0], numpy.cumsum(numpy.bincount(rows, minlength=n))])
+        self.indices = cols
+        self._neighbor_routes = [[int(r) for r in self.route_ids[self.neighbors(i)]] for i in range(n)]
+
+        # Edge lengths in tiles: junctions are adjacent along a row or a column.
+        lengths = numpy.abs(tiles[rows] - tiles[cols]).sum(axis=1)
+        self.distance, self.next_hop = all_pairs_next_hop(n, rows, cols, lengths)
+
+        # Each segment's end junctions, and its tiles' route ids concatenated, for painted queries.
+        self.segment_ends = numpy.array(index.segments, dtype=numpy.int64).reshape(-1, 2)
+        seg_tiles = [index.segment_id_to_tile_set[k] for k in range(1, len(index.segments) + 1)]
+        self._segment_tiles = numpy.array([rid for t in seg_tiles for rid in t], dtype=numpy.int64)
+        self._segment_starts = numpy.concatenate([[0], numpy.cumsum([len(t) for t in seg_tiles])[:-1]]).astype(numpy.int64)
+
+    @property
+    def num_junctions(self) -> int:
+        return len(self.route_ids)
+
+    def neighbors(self, junction: int) -> numpy.ndarray:
+        """Junction ids adjacent to ``junction``."""
+        return self.indices[self.indptr[junction]:self.indptr[junction + 1]]
+
+    def neighbor_routes(self, junction: int) -> List[int]:
+        """Route ids of the junctions adjacent to ``junction``; do not modify the list."""
+        return self._neighbor_routes[junction]
+
+    def next_route(self, source: int, target: int) -> int:
+        """Route id of the first junction after ``source`` on a shortest path to ``target``."""
+        return int(self.route_ids[self.next_hop[source, target]])
+
+    def unpainted_segments(self, painted: numpy.ndarray) -> numpy.ndarray:
+        """Whether each segment (index ``id - 1``) has a tile not set in the (height, width) ``painted`` mask."""
+        if not len(self.segment_ends):
+            return numpy.zeros(0, dtype=bool)
+        done = numpy.logical_and.reduceat(painted.reshape(-1)[self._segment_tiles], self._segment_starts)
+        return ~done
+
+    def nearest_unpainted(self, junction: int, painted: numpy.ndarray) -> Optional[Tuple[int, int]]:
+        """(segment id, its nearer end) of the closest segment with unpainted tiles, or None when all are painted."""
+        unpainted = numpy.flatnonzero(self.unpainted_segments(painted))
+        if not len(unpainted):
+            return None
+        ends = self.segment_ends[unpainted]
+        dist = self.distance[junction, ends]
+        nearer = dist.argmin(axis=1)
+        best = int(dist[numpy.arange(len(ends)), nearer].argmin())
+        return int(unpainted[best]) + 1, int(ends[best, nearer[best]])
+
+    def toward_unpainted(self, junction: int, painted: numpy.ndarray) -> Optional[int]:
+        """Route id of the junction to head for from ``junction`` to paint the nearest unpainted segment."""
+        nearest = self.nearest_unpainted(junction, painted)
+        if nearest is None:
+            return None
+        seg_id, end = nearest
+        if end == junction:
+            # Already at the segment: walk along it to its other end.
+            e1, e2 = self.segment_ends[seg_id - 1]
+            return int(self.route_ids[e2 if e1 == junction else e1])
+        return self.next_route(junction, end)
+
+
+def all_pairs_next_hop(n: int, rows: numpy.ndarray, cols: numpy.ndarray, lengths: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Floyd-Warshall over a graph of ``n`` nodes given as directed edges: (distance, next hop) matrices.
+
+    Unreachable pairs have infinite distance and next hop -1; a node's next
+    hop to itself is itself. Of equally short paths, the first found is kept.
+    """
+    distance = numpy.full((n, n), numpy.inf)
+    next_hop = numpy.full((n, n), -1, dtype=numpy.int64)
+    distance[rows, cols] = lengths
+    next_hop[rows, cols] = cols
+    diagonal = numpy.arange(n)
+    distance[diagonal, diagonal] = 0
+    next_hop[diagonal, diagonal] = diagonal
+    for k in range(n):
+        through = distance[:, k, None] + distance[None, k, :]
+        shorter = through < distance
+        distance = numpy.where(shorter, through, distance)
+        next_hop = numpy.where(shorter, next_hop[:, k, None], next_hop)
+    return distance, next_hop
+
+
+_routes : Dict[int, JunctionRoutes] = {}
+
+
+def board_routes(index: BoardIndex, width: int) -> JunctionRoutes:
+    """The routes for ``index``, built once per board index (see index_board)."""
+    routes = _routes.get(id(index))
+    if routes is None or routes.index is not index or routes.width != width:
+        routes = _routes[id(index)] = JunctionRoutes(index, width)
+    return routes
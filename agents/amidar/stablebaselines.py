@@ -1,13 +1,17 @@
 import gym
+import numpy
 from gym import logger
 
 from toybox import Toybox, Input
 from agents.base import *
+from agents.inference import InferenceServer, shared_server
+from agents.numpy_policy import NumpyPolicy, weights_file
 
 from toybox.envs import get_turtle
 from toybox.envs.atari.constants import ACTION_LOOKUP
 
-from stable_baselines3.common.atari_wrappers import AtariWrapper
+from stable_baselines3.common import atari_wrappers
+from agents.envs import wrap_atari
 from stable_baselines3.common.vec_env import VecFrameStack
 from stable_baselines3 import DQN, A2C, PPO
 
@@ -17,6 +21,7 @@ class StableBaselines(Agent, ABC):
       model_name = 'A2C', model_path = 'data/stablebaselines_a2c_amidar_1e4.regress.zip',
       additional_wrappers=lambda env: env,
       deterministic = False,
+      shared_model = False, max_batch = 32, backend = 'torch', weights_path = None, fast_downscale = False,
       ** kwargs):
 
       nenv = 1 # stable-baselines agents
@@ -24,9 +29,24 @@ class StableBaselines(Agent, ABC):
       env_type = 'atari'
       family = model_name
 
-      # assert model exists
-      self.model = self.getModel(family, seed, model_path)
       self.deterministic = False
+      if backend == 'numpy':
+        # Weights from `python -m agents.numpy_policy export`; the torch model is never loaded.
+        load_model = lambda: NumpyPolicy.load(weights_path or weights_file(model_path), seed)
+      else:
+        load_model = lambda: self.getModel(family, seed, model_path)
+      if shared_model:
+        # Load the model once per process and run it on many agents' observations at once.
+        deterministic = self.deterministic
+        def load():
+          model = load_model()
+          return InferenceServer(lambda obs: model.predict(obs, deterministic=deterministic)[0], max_batch=max_batch)
+        self.inference = shared_server((family, model_path, deterministic, backend), load)
+        self.model = None
+      else:
+        # assert model exists
+        self.inference = None
+        self.model = load_model()
 
       # The action_repeat value comes from the skip argument of
       self.action_repeat = action_repeat
@@ -38,7 +58,8 @@ class StableBaselines(Agent, ABC):
       env = self.setUpToyboxGym(self, env_id,
                                  seed=self.seed,
                                  frame_stack_size=frame_stack_size,
-                                 additional_wrappers=additional_wrappers)
+                                 additional_wrappers=additional_wrappers,
+                                 fast_downscale=fast_downscale)
 
       self.env = env
       # self.model.set_env(env) if loading for retraining, need to set the model env
@@ -49,7 +70,7 @@ class StableBaselines(Agent, ABC):
       self.turtle = get_turtle(self.env)
       self.turtle.toybox.set_seed(self.seed)
       self.toybox = toybox
-      self._reset_seed(self.seed)
+      self._reset_seed(self.seed, self.seed_toybox)
       if withstate: self.turtle.toybox.write_state_json(withstate)
 
       self.done = False
@@ -72,12 +93,16 @@ class StableBaselines(Agent, ABC):
         return model
 
     @staticmethod
-    def setUpToyboxGym(agentclass, env_id, seed, frame_stack_size=4, additional_wrappers = lambda env: env):
+    def setUpToyboxGym(agentclass, env_id, seed, frame_stack_size=4, additional_wrappers = lambda env: env, fast_downscale = False):
         env = gym.make(env_id, alpha=False,
                                grayscale=True)  # gym needs these tb constructor args with make_atari_env
         # allow a custom wrapper
         env = additional_wrappers(env)
-        env = AtariWrapper(env, frame_skip=agentclass.action_repeat)
+        if fast_downscale:
+            # As AtariWrapper, but frames are downscaled without a full-resolution resize.
+            env = wrap_atari(env, atari_wrappers, frame_skip=agentclass.action_repeat, fast_downscale=True)
+        else:
+            env = atari_wrappers.AtariWrapper(env, frame_skip=agentclass.action_repeat)
         if frame_stack_size > 1:
             env = VecFrameStack(env, n_stack=frame_stack_size)
 
@@ -90,25 +115,30 @@ class StableBaselines(Agent, ABC):
         return env
 
     def wrap_predict(self, obs, state, deterministic):
+      if self.inference is not None:
+        # Shared models are feed-forward; there is no recurrent state to carry.
+        obs = numpy.asarray(obs)
+        if obs.ndim == 3:
+          # A single (84, 84, 1) frame, without a VecFrameStack: the server takes batches.
+          return self.inference.predict(obs[None])[0], state
+        return self.inference.predict(obs), state
       action, state = self.model.predict(obs, state=state, deterministic=deterministic)
       return action, state
 
     def get_action(self):
-        inputobj = Input()
         action, state = self.wrap_predict(self.obs, self.state, self.deterministic)
         # modify input
         # convert returned action to input
         # Frameskip workaround if model maintains its own env
         # self.toybox.write_state_json(self.turtle.toybox.state_to_json())
         tb_action = self.toybox.get_legal_action_set()[action]
-        ale_meaning = ACTION_MEANING[tb_action]
-        inputobj = ALE_string_to_input(ale_meaning)
-        if self.toybox.game_name == 'amidar' and inputobj:
+        code = ale_string_code(ACTION_MEANING[tb_action])
+        if self.toybox.game_name == 'amidar' and code is not None:
             # don't allow fire
-            inputobj.button1 = False
+            code &= ~BUTTON1
         done = self.done
 
-        return inputobj if not done else None
+        return INPUTS[code] if code is not None and not done else None
 
     def resetEnv(self):
         self._frame_counter = 0
@@ -1,3 +1,8 @@
+import hashlib
+import os
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
 import toybox.interventions.amidar as ami
 import numpy
 
@@ -17,99 +22,182 @@ def player_on_junction(intervention):
     player_tid = tile_to_route_id(intervention, ptp.tx, ptp.ty)
     return player_tid in intervention.game.board.junctions
 
-def index_junctions(intervention):
-    # add junctions to set
-    # we may discover them more than once iterating over boxes
-    # annotate the junction tiles
-    board = intervention.game.board
-    box_junctions = set()
-    for box in board.boxes:
-        box_junctions.add((box.top_left.tx, box.top_left.ty))
-        box_junctions.add((box.top_left.tx, box.bottom_right.ty))
-        box_junctions.add((box.bottom_right.tx, box.top_left.ty))
-        box_junctions.add((box.bottom_right.tx, box.bottom_right.ty))
-
-    # now get a graph adjacency matrix from the tile annotation:
-    junction_list = list(box_junctions)
-    njunctions = len(junction_list)
-    # sort the tile ids in box_junctions
-    # tile_ids use top left as origin, use sort order (y,x)
-    sorted_junction_tiles = sorted(junction_list,
-                                   key=lambda x: (x[1], x[0]))
-    # get the adjacency matrix for the sorted ids
-    adj_mat = numpy.zeros((njunctions, njunctions), numpy.int8)
-    # save id order index
-    junction_id_to_tile = {}
-    junction_tile_to_id = {}
-    # first iterate over the horizontal neighbors
-    for i, t in enumerate(sorted_junction_tiles):
-        junction_id_to_tile[i] = t
-        junction_tile_to_id[t] = i
-        if i < njunctions - 1:
-            if sorted_junction_tiles[i][1] == sorted_junction_tiles[i + 1][1]:
-                adj_mat[i, i + 1] = 1
-                adj_mat[i + 1, i] = 1
-
-    # re-sort by (x,y)
-    sorted_junction_tiles = sorted(junction_list,
-                                   key=lambda x: (x[0], x[1]))
-    # add vertical neighbors
-    for i, t in enumerate(sorted_junction_tiles):
-        if i < njunctions - 1:
-            if sorted_junction_tiles[i][0] == sorted_junction_tiles[i + 1][0]:
-                if abs(sorted_junction_tiles[i][1] - sorted_junction_tiles[i + 1][1]) < 7:
-                    tile_id = junction_tile_to_id[t]
-                    tile_adj = sorted_junction_tiles[i + 1]
-                    tile_adj_id = junction_tile_to_id[tile_adj]
-                    adj_mat[tile_id, tile_adj_id] = 1
-                    adj_mat[tile_adj_id, tile_id] = 1
-
-    return adj_mat, junction_tile_to_id, junction_id_to_tile
 
-def index_segments(intervention, adj_mat, junction_id_to_tile):
-    tile_to_segment_id = {}
-    for tile in intervention.filter_tiles(lambda t: t.tag != ami.Tile.Empty):
-        tp = intervention.tile_to_tilepoint(tile)
-        rid = tile_to_route_id(intervention, tp.tx, tp.ty)
-        tile_to_segment_id[rid] = set()
-    nsegments = sum(sum(adj_mat))/2
+class BoardIndex(NamedTuple):
+    """The junction graph of an Amidar board (see index_board)."""
+    adj_mat: numpy.ndarray
+    # Junction ids are positions in (ty, tx) order; tiles are (tx, ty).
+    junction_tile_to_id: Dict[Tuple[int, int], int]
+    junction_id_to_tile: Dict[int, Tuple[int, int]]
+    # (e1, e2) junction pairs; segment ids start at 1 (segment k is segments[k - 1]).
+    segments: List[Tuple[int, int]]
+    # Route ids of every non-empty tile -> ids of the segments through it, and the reverse.
+    tile_to_segment_id: Dict[int, List[int]]
+    segment_id_to_tile_set: Dict[int, List[int]]
+
+
+# Boards are static per game config, so their indexes are kept across runs.
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'toyboxagents', 'amidar')
+# Part of every cache key: bump it when the index's contents or layout change.
+INDEX_VERSION = 3
+_board_indexes : Dict[str, BoardIndex] = {}
+
+
+def board_boxes(board: Dict[str, Any]) -> numpy.ndarray:
+    """(nboxes, 4) array of each box's top left and bottom right (tx, ty), from the board's JSON."""
+    return numpy.array([[box['top_left']['tx'], box['top_left']['ty'], box['bottom_right']['tx'], box['bottom_right']['ty']]
+                        for box in board['boxes']], dtype=numpy.int32).reshape(-1, 4)
+
+
+def board_layout(board: Dict[str, Any]) -> numpy.ndarray:
+    """(height, width) mask of the tiles that are not Empty, from the board's JSON."""
+    return numpy.array(board['tiles']) != ami.Tile.Empty
+
+
+def board_key(boxes: numpy.ndarray, layout: numpy.ndarray) -> str:
+    # Painting changes tile tags but not the track, so the key uses the mask.
+    digest = hashlib.sha1()
+    for a in (numpy.array((INDEX_VERSION,) + layout.shape, dtype=numpy.int32), boxes.astype(numpy.int32), layout.astype(numpy.uint8)):
+        digest.update(numpy.ascontiguousarray(a).tobytes())
+    return digest.hexdigest()
+
+
+def junction_graph(boxes: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Junction tiles (njunctions, 2) of (tx, ty) in (ty, tx) order, and their adjacency matrix.
+
+    Junctions are box corners. Neighbors in the same row are adjacent; so
+    are neighbors in the same column less than 7 tiles apart.
+    """
+    corners = numpy.concatenate([boxes[:, [0, 1]], boxes[:, [0, 3]], boxes[:, [2, 1]], boxes[:, [2, 3]]])
+    tiles = numpy.unique(corners, axis=0)
+    tiles = tiles[numpy.lexsort((tiles[:, 0], tiles[:, 1]))]
+    adj_mat = numpy.zeros((len(tiles), len(tiles)), numpy.int8)
+
+    row = numpy.flatnonzero(tiles[1:, 1] == tiles[:-1, 1])
+    adj_mat[row, row + 1] = adj_mat[row + 1, row] = 1
+
+    by_column = numpy.lexsort((tiles[:, 1], tiles[:, 0]))
+    a, b = by_column[:-1], by_column[1:]
+    column = (tiles[a, 0] == tiles[b, 0]) & (numpy.abs(tiles[a, 1] - tiles[b, 1]) < 7)
+    adj_mat[a[column], b[column]] = adj_mat[b[column], a[column]] = 1
+    return tiles, adj_mat
+
+
+def _segment_index(tiles: numpy.ndarray, adj_mat: numpy.ndarray, layout: numpy.ndarray) -> BoardIndex:
+    width = layout.shape[1]
+    junction_id_to_tile = {i: (int(tx), int(ty)) for i, (tx, ty) in enumerate(tiles)}
+    junction_tile_to_id = {t: i for i, t in junction_id_to_tile.items()}
+    tile_to_segment_id : Dict[int, List[int]] = {int(rid): [] for rid in numpy.flatnonzero(layout)}
     segments = []
     segment_id_to_tile_set = {}
-    for seg in segments:
-        segment_id_to_tile_set[seg] = set()
-    # add all segment tiles to set
-    for e1 in range(adj_mat.shape[0]): # for every self.adj_mat > 1
-        for e2 in range(e1,adj_mat.shape[1]): # just loop over triangle
-            if adj_mat[e1,e2]:                # adj_mat is symmetric
-                segments.append((e1,e2))
-                seg_id = len(segments)
-                segtiles = set()
-
-                tid_e1 = junction_id_to_tile[e1]
-                tid_e2 = junction_id_to_tile[e2]
-                if tid_e1[0] == tid_e2[0]:
-                    emin = min(tid_e1[1], tid_e2[1])
-                    emax = max(tid_e1[1], tid_e2[1])
-
-                    for yy in range(emin, emax+1):
-                        tp = ami.TilePoint(intervention, tx=tid_e1[0], ty=yy)
-                        rid = tile_to_route_id(intervention, tp.tx, tp.ty)
-                        segtiles.add(rid)
-                elif tid_e1[1] == tid_e2[1]:
-                    emin = min(tid_e1[0], tid_e2[0])
-                    emax = max(tid_e1[0], tid_e2[0])
-
-                    for xx in range(emin, emax+1):
-                        tp = ami.TilePoint(intervention, tx=xx, ty=tid_e1[1])
-                        rid = tile_to_route_id(intervention, tp.tx, tp.ty)
-                        segtiles.add(rid)
-
-                # add segment id to tile list
-                for rid in segtiles:
-                    tile_to_segment_id[rid].add(seg_id)
-                segment_id_to_tile_set[seg_id] = segtiles
-    for k in segment_id_to_tile_set.keys():
-        segment_id_to_tile_set[k] = list(segment_id_to_tile_set[k])
-    for k in tile_to_segment_id.keys():
-        tile_to_segment_id[k] = list(tile_to_segment_id[k])
-    return segments, tile_to_segment_id, segment_id_to_tile_set
\ No newline at end of file
+    # Upper triangle in row-major order, as the original crawl numbered segments.
+    for e1, e2 in zip(*numpy.nonzero(numpy.triu(adj_mat))):
+        segments.append((int(e1), int(e2)))
+        seg_id = len(segments)
+        (x1, y1), (x2, y2) = tiles[e1], tiles[e2]
+        if x1 == x2:
+            rids = width * numpy.arange(min(y1, y2), max(y1, y2) + 1) + x1
+        elif y1 == y2:
+            rids = width * y1 + numpy.arange(min(x1, x2), max(x1, x2) + 1)
+        else:
+            rids = numpy.empty(0, dtype=int)
+        segment_id_to_tile_set[seg_id] = list(set(rids.tolist()))
+        for rid in segment_id_to_tile_set[seg_id]:
+            tile_to_segment_id[rid].append(seg_id)
+    # The original crawl collected both maps in sets; keep its list orders.
+    for rid, seg_ids in tile_to_segment_id.items():
+        tile_to_segment_id[rid] = list(set(seg_ids))
+    return BoardIndex(adj_mat, junction_tile_to_id, junction_id_to_tile, segments, tile_to_segment_id, segment_id_to_tile_set)
+
+
+def _ragged(lists: List[List[int]]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Lists of ints as (values, starts): list i is values[starts[i]:starts[i + 1]]."""
+    starts = numpy.concatenate([[0], numpy.cumsum([len(l) for l in lists], dtype=numpy.int64)]).astype(numpy.int64)
+    return numpy.array([v for l in lists for v in l], dtype=numpy.int64), starts
+
+
+def _unragged(values: numpy.ndarray, starts: numpy.ndarray) -> List[List[int]]:
+    return [values[starts[i]:starts[i + 1]].tolist() for i in range(len(starts) - 1)]
+
+
+def index_arrays(index: BoardIndex) -> Dict[str, numpy.ndarray]:
+    """``index`` as plain arrays, for ``numpy.savez``; index_from_arrays inverts it."""
+    n = len(index.junction_id_to_tile)
+    seg_ids = sorted(index.segment_id_to_tile_set)
+    tile_rids = list(index.tile_to_segment_id)
+    seg_tiles, seg_tile_starts = _ragged([index.segment_id_to_tile_set[k] for k in seg_ids])
+    tile_segs, tile_seg_starts = _ragged([index.tile_to_segment_id[rid] for rid in tile_rids])
+    return {
+        'adj_mat': index.adj_mat,
+        'junction_tiles': numpy.array([index.junction_id_to_tile[i] for i in range(n)], dtype=numpy.int64).reshape(-1, 2),
+        'segments': numpy.array(index.segments, dtype=numpy.int64).reshape(-1, 2),
+        'segment_ids': numpy.array(seg_ids, dtype=numpy.int64),
+        'segment_tiles': seg_tiles, 'segment_tile_starts': seg_tile_starts,
+        'tile_rids': numpy.array(tile_rids, dtype=numpy.int64),
+        'tile_segments': tile_segs, 'tile_segment_starts': tile_seg_starts,
+    }
+
+
+def index_from_arrays(arrays) -> BoardIndex:
+    """The BoardIndex saved by index_arrays; raises ValueError if the arrays do not fit together."""
+    adj_mat, tiles = arrays['adj_mat'], arrays['junction_tiles']
+    segment_ids, tile_rids = arrays['segment_ids'].tolist(), arrays['tile_rids'].tolist()
+    seg_tiles = _unragged(arrays['segment_tiles'], arrays['segment_tile_starts'])
+    tile_segs = _unragged(arrays['tile_segments'], arrays['tile_segment_starts'])
+    if (adj_mat.shape != (len(tiles), len(tiles)) or tiles.shape[1:] != (2,)
+            or len(seg_tiles) != len(segment_ids) or len(tile_segs) != len(tile_rids)):
+        raise ValueError('inconsistent board index arrays')
+    junction_id_to_tile = {i: (int(tx), int(ty)) for i, (tx, ty) in enumerate(tiles)}
+    return BoardIndex(adj_mat,
+                      {t: i for i, t in junction_id_to_tile.items()},
+                      junction_id_to_tile,
+                      [(int(e1), int(e2)) for e1, e2 in arrays['segments']],
+                      dict(zip(tile_rids, tile_segs)),
+                      dict(zip(segment_ids, seg_tiles)))
+
+
+def _load_index(path: str) -> Optional[BoardIndex]:
+    """The index saved at ``path``, or None if it is missing or unreadable (it is then rebuilt)."""
+    try:
+        with numpy.load(path, allow_pickle=False) as arrays:
+            return index_from_arrays(arrays)
+    except Exception:
+        # Missing, partial, corrupt, or from another layout: the caller rebuilds and overwrites it.
+        return None
+
+
+def index_board(board: Dict[str, Any], cache_dir: Optional[str] = CACHE_DIR) -> BoardIndex:
+    """The junction graph of ``board`` (the board's JSON, ``state_to_json()['board']``), cached by a hash of its layout.
+
+    Lookups hit memory first, then an ``.npz`` of plain arrays in
+    ``cache_dir`` (None disables the disk cache).
+    """
+    boxes, layout = board_boxes(board), board_layout(board)
+    key = board_key(boxes, layout)
+    if key in _board_indexes:
+        return _board_indexes[key]
+
+    path = os.path.join(cache_dir, key + '.npz') if cache_dir else None
+    index = _load_index(path) if path else None
+    if index is None:
+        index = _segment_index(*junction_graph(boxes), layout)
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write then rename, so concurrent agents never read a partial file.
+            tmp = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp, 'wb') as f:
+                numpy.savez(f, **index_arrays(index))
+            os.replace(tmp, path)
+
+    _board_indexes[key] = index
+    return index
+
+
+def index_junctions(intervention):
+    index = index_board(intervention.toybox.state_to_json()['board'])
+    return index.adj_mat, index.junction_tile_to_id, index.junction_id_to_tile
+
+def index_segments(intervention, adj_mat, junction_id_to_tile):
+    tiles = numpy.array([junction_id_to_tile[i] for i in range(len(junction_id_to_tile))], dtype=numpy.int32).reshape(-1, 2)
+    index = _segment_index(tiles, adj_mat, board_layout(intervention.toybox.state_to_json()['board']))
+    return index.segments, index.tile_to_segment_id, index.segment_id_to_tile_set
@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
-from typing import Union, List
+from functools import lru_cache
+from typing import Dict, Union, List, Optional
 from ctoybox import Toybox, Input
 from toybox.envs.atari.constants import ACTION_MEANING
-from toybox.interventions import Game, state_from_toybox
+from toybox.interventions import Game
+from .actionlog import write_action_log, encode_actions, input_to_bitmask, bitmask_to_input, bitmask_to_string, \
+    INPUT_BITS, NO_ACTION, EXTENSION as ACTION_LOG_EXTENSION
+from .history import StateHistory
+from .instrument import StepProfiler, EXTENSION as PROFILE_EXTENSION
+from .lazy import LazyState
+from .trajectory import TrajectoryWriter, trajectory_file, replay_file
+from .writers import AsyncWriter, write_png, write_json
 import os, signal
 
 try:
@@ -12,97 +20,179 @@ except:
 
 import random
 
+# Action codec. Every action has a small, stable integer code: an Input is
+# the bitmask of its buttons (see agents.actionlog.INPUT_BITS), an ALE action
+# is ALE_CODE_OFFSET plus its ALE number, and None is NO_ACTION. INPUTS holds
+# one shared, frozen Input per bitmask; agents return these rather than
+# building a new Input per step.
+NOOP = 0
+LEFT = INPUT_BITS['left']
+RIGHT = INPUT_BITS['right']
+UP = INPUT_BITS['up']
+DOWN = INPUT_BITS['down']
+BUTTON1 = INPUT_BITS['button1']
+BUTTON2 = INPUT_BITS['button2']
+
+ALE_CODE_OFFSET = 1 << len(INPUT_BITS)
+
+
+class FrozenInput(Input):
+    """An ``Input`` that raises on any change, so a shared one cannot be corrupted; ``thaw`` gives a mutable copy."""
+
+    def __init__(self, code: int):
+        for button, bit in INPUT_BITS.items():
+            object.__setattr__(self, button, bool(code & bit))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('shared Inputs are read-only; change a copy from thaw()')
+
+    def __delattr__(self, name):
+        raise AttributeError('shared Inputs are read-only; change a copy from thaw()')
+
+    def reset(self):
+        raise AttributeError('shared Inputs are read-only; change a copy from thaw()')
+
+    def set_input(self, *args, **kwargs):
+        raise AttributeError('shared Inputs are read-only; change a copy from thaw()')
+
+    def thaw(self) -> Input:
+        return bitmask_to_input(input_to_bitmask(self))
+
+
+INPUTS : List[Input] = [FrozenInput(code) for code in range(ALE_CODE_OFFSET)]
+_INTERNED : Dict[int, int] = {id(inp): code for code, inp in enumerate(INPUTS)}
+
+ACTION_STRINGS : Dict[int, str] = {code: bitmask_to_string(code) for code in range(ALE_CODE_OFFSET)}
+ACTION_STRINGS.update({ALE_CODE_OFFSET + a: meaning for a, meaning in ACTION_MEANING.items()})
+ACTION_STRINGS[NO_ACTION] = 'noop'
+
+# -1 for actions logged as 'left', 1 for 'right' (in either case), else 0.
+HORIZONTAL_MOVE : List[int] = [0] * (NO_ACTION + 1)
+for _code, _string in ACTION_STRINGS.items():
+    HORIZONTAL_MOVE[_code] = {'LEFT': -1, 'RIGHT': 1}.get(_string.upper(), 0)
+
+_STRING_CODES : Dict[str, int] = {'': NOOP, 'noop': NOOP, 'fire': BUTTON1}
+_STRING_CODES.update(INPUT_BITS)
+_STRING_CODES.update({meaning: ALE_CODE_OFFSET + a for a, meaning in ACTION_MEANING.items()})
+
+
+def action_code(action: Union[Input, int, str, None]) -> int:
+    code = _INTERNED.get(id(action))
+    if code is not None:
+        return code
+    if action is None:
+        return NO_ACTION
+    if type(action) == int:
+        return ALE_CODE_OFFSET + action
+    if isinstance(action, Input):
+        return input_to_bitmask(action)
+    if type(action) == str:
+        for key in (action, action.strip(), action.strip().lower()):
+            if key in _STRING_CODES:
+                return _STRING_CODES[key]
+        # As string_to_input did, an unknown string is no action (logs may hold anything).
+        return NO_ACTION
+    raise ValueError('Unknown action: {}'.format(action))
+
+
+def code_to_action(code: int) -> Union[Input, int, None]:
+    if code == NO_ACTION:
+        return None
+    if code >= ALE_CODE_OFFSET:
+        return code - ALE_CODE_OFFSET
+    return INPUTS[code]
+
+
+def apply_action_code(toybox: Toybox, code: int):
+    if code == NO_ACTION:
+        return
+    if code >= ALE_CODE_OFFSET:
+        toybox.apply_ale_action(code - ALE_CODE_OFFSET)
+    else:
+        toybox.apply_action(INPUTS[code])
+
+
 def action_to_string(action: Union[Input, int, str]):
-    if action is None: 
-        return 'noop'
     if type(action) == str: 
         return action
-    if type(action) == int:
-        return ACTION_MEANING[action]
-    elif isinstance(action, Input):
-        if action.left:
-            return 'left'
-        elif action.right:
-            return 'right'
-        elif action.up:
-            return 'up'
-        elif action.down:
-            return 'down'
-        elif action.button1:
-            return 'button1'
-        elif action.button2:
-            return 'button2'
-        else:
-            return 'noop'
-    else: assert False
+    return ACTION_STRINGS[action_code(action)]
 
 
 def string_to_input(action: str) -> Input:
-    actobj = Input()
-    if action is None or action == '':
-        return actobj
-    if action == 'left':
-        actobj.left = True
-        return actobj
-    if action == 'right':
-        actobj.right = True
-        return actobj
-    if action == 'up':
-        actobj.up = True
-        return actobj
-    if action == 'down':
-        actobj.down = True
-        return actobj
-    if action == 'fire' or action == 'button1':
-        actobj.button1 = True
-        return actobj
-    if action == 'button2':
-        actobj.button2 = True
-        return actobj
+    if action is None:
+        return INPUTS[NOOP]
+    code = _STRING_CODES.get(action)
+    return None if code is None or code >= ALE_CODE_OFFSET else INPUTS[code]
 
-def ALE_string_to_input(action: str) -> Input:
+
+@lru_cache(maxsize=None)
+def ale_string_code(action: str) -> Optional[int]:
+    """The single-button Input code for an ALE action name, or None if it presses nothing."""
     action = action.lower()
-    actobj = Input()
-    if action is None or not len(action):
-        return actobj
-    if 'left' in action:
-        actobj.left = True
-        return actobj
-    if 'right' in action:
-        actobj.right = True
-        return actobj
-    if 'up' in action:
-        actobj.up = True
-        return actobj
-    if 'down' in action:
-        actobj.down = True
-        return actobj
+    if not len(action):
+        return NOOP
+    for button in ('left', 'right', 'up', 'down'):
+        if button in action:
+            return INPUT_BITS[button]
     if 'fire' in action or 'button1' in action:
-        actobj.button1 = True
-        return actobj
+        return BUTTON1
     if 'button2' in action:
-        actobj.button2 = True
-        return actobj
+        return BUTTON2
+    return None
+
+
+def ALE_string_to_input(action: str) -> Input:
+    code = ale_string_code(action)
+    return None if code is None else INPUTS[code]
 
 
 class Agent(ABC):
 
-    def __init__(self, toybox: Toybox, seed = 1234, action_repeat=1):
+    def __init__(self, toybox: Toybox, seed = 1234, action_repeat=1, seed_toybox=True):
         self.toybox = toybox
         self.name = self.__class__.__name__
         self._frame_counter = 0
         self.action_repeat = action_repeat
         self.actions : List[Union[str, int]] = []
-        self.states : List[Game] = []
-        self._reset_seed(seed)
+        self.states = StateHistory(toybox)
+        # 'files' writes a .png and a .json per frame; 'trajectory' appends
+        # every state to a single .traj file (see agents.trajectory); 'replay'
+        # keeps only every keyframe_interval-th state (see agents.replay).
+        self.output_format = 'files'
+        self.keyframe_interval = 64
+        self._trajectory : Optional[TrajectoryWriter] = None
+        # 'text' writes one action name per line (.act); 'binary' writes a
+        # uint8 code per action (.actb, see agents.actionlog).
+        self.action_log_format = 'text'
+        # When set, frame and state files are written on background threads.
+        self.writer : Optional[AsyncWriter] = None
+        # When set, step phases are timed and summarized when play ends.
+        self.profiler : Optional[StepProfiler] = None
+        # Agents whose get_action already advances self.toybox (e.g., through
+        # a gym env sharing it; see agents.envs) set this, so step only records.
+        self.steps_in_get_action = False
+        # Scripted agents draw from this rather than the module-level random,
+        # so agents sharing a process do not perturb each other's sequences.
+        self.rng = random.Random(seed)
+        # False when the game was already seeded and started (see agents.pool.new_game).
+        self.seed_toybox = seed_toybox
+        self._reset_seed(seed, seed_toybox)
 
     def __str__(self):
         return self.__class__.__name__
 
-    def _reset_seed(self, seed):
+    def _reset_seed(self, seed, seed_toybox=True):
         self.seed = seed
-        self.toybox.set_seed(seed)
-        random.seed(seed)
+        if seed_toybox:
+            self.toybox.set_seed(seed)
+        self.rng.seed(seed)
+
+    def get_rng_state(self):
+        """The state of this agent's random stream; see ``set_rng_state``."""
+        return self.rng.getstate()
+
+    def set_rng_state(self, state):
+        self.rng.setstate(state)
 
     def next_frame_id(self):
         self._frame_counter += self.action_repeat
@@ -113,46 +203,102 @@ class Agent(ABC):
         return path + os.sep + self.name + str(fc).zfill(5)
 
     def write_data(self, path: str, write_json_to_file, save_states):
-        if write_json_to_file:
+        if write_json_to_file and self.output_format in ('trajectory', 'replay'):
+            if self._trajectory is None:
+                replay = self.output_format == 'replay'
+                self._trajectory = TrajectoryWriter((replay_file if replay else trajectory_file)(path, self.name),
+                    game=self.toybox.game_name,
+                    agent=self.name,
+                    seed=self.seed,
+                    action_repeat=self.action_repeat,
+                    keyframe_interval=self.keyframe_interval if replay else 1)
+            fc = self.next_frame_id()
+            if self.output_format == 'trajectory' or (fc // self.action_repeat - 1) % self.keyframe_interval == 0:
+                self._trajectory.append(fc, self.toybox.state_to_json())
+        elif write_json_to_file and self.writer:
+            f = self._next_file(path)
+            # Only snapshot here; encoding happens on the writer threads.
+            frame = self.toybox.rstate.render_frame_color(self.toybox.rsimulator)
+            self.writer.submit(write_png, f + '.png', frame)
+            self.writer.submit(write_json, f + '.json', self.toybox.state_to_json())
+        elif write_json_to_file:
             f = self._next_file(path)
             img = f + '.png'
             json = f + '.json'
             self.toybox.save_frame_image(img)
             with open(json, 'w') as ff:
                 ujson.dump(self.toybox.state_to_json(), ff)
-        
+
+    def use_async_output(self, workers=2, maxsize=64):
+        """Writes frames and states from ``workers`` background threads."""
+        self.close_writer()
+        self.writer = AsyncWriter(workers=workers, maxsize=maxsize)
+
+    def close_writer(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def use_profiler(self, count_bytes=True) -> StepProfiler:
+        """Times the phases of every step from now on (see agents.instrument)."""
+        if self.profiler is not None:
+            self.profiler.detach()
+        self.profiler = StepProfiler(self.name, count_bytes).attach(self)
+        return self.profiler
+
+    def report_profile(self, path=None):
+        if self.profiler is not None:
+            self.profiler.report(path + os.sep + self.name + PROFILE_EXTENSION if path else None)
+
+    def stop_profiler(self, path=None):
+        """Reports the profile and undoes its patches; the next ``begin_play`` attaches it again."""
+        if self.profiler is not None:
+            self.report_profile(path)
+            self.profiler.detach()
+
 
     def save_actions(self, path):
         os.makedirs(path, exist_ok=True)
         if not path: return
+        if self.action_log_format == 'binary':
+            codes, encoding = encode_actions(self.actions)
+            write_action_log(path + os.sep + self.name + ACTION_LOG_EXTENSION, codes, encoding,
+                agent=self.name, seed=self.seed, action_repeat=self.action_repeat)
+            return
         with open(path + os.sep + self.name + '.act', 'w') as f:
             for action in self.actions:
                 f.write(action_to_string(action)+'\n')
 
+    def close_trajectory(self):
+        if self._trajectory is not None:
+            self._trajectory.close([action_to_string(a) for a in self.actions],
+                action_codes=[action_code(a) for a in self.actions],
+                last_frame=self._frame_counter)
+            self._trajectory = None
+
     def kill_and_record(self, path):
         def inner(sig, frame):
+            if self.writer is not None: self.writer.flush()
             self.save_actions(path)
+            self.close_trajectory()
+            self.stop_profiler(path)
             exit(0)
         return inner
 
     @abstractmethod
     def get_action(self) -> Input: pass
 
-    @staticmethod
-    def random_action() -> Input:
-        r_in = Input()
-        hdir = random.choice([Input._LEFT, Input._RIGHT, Input._NOOP])
-        vdir = random.choice([Input._UP, Input._DOWN, Input._NOOP])
-        b_act = random.choice([Input._NOOP, Input._BUTTON1, Input._BUTTON2])
-
-        r_in.set_input(hdir)
-        r_in.set_input(vdir, b_act)
-        return r_in
+    def random_action(self) -> Input:
+        hdir = self.rng.choice([LEFT, RIGHT, NOOP])
+        vdir = self.rng.choice([UP, DOWN, NOOP])
+        b_act = self.rng.choice([NOOP, BUTTON1, BUTTON2])
+        return INPUTS[hdir | vdir | b_act]
 
     def reset(self, seed=None):
         # Should we also reset/call new game for toybox in here?
         self.toybox.new_game()
-        self.states = []
+        self.close_trajectory()
+        self.states = StateHistory(self.toybox)
         self.actions = []
         self._frame_counter = 0
         if seed:
@@ -162,38 +308,49 @@ class Agent(ABC):
         action = self.get_action()
         self.actions.append(action)
 
-        if action is not None:
-            for a in [action] * self.action_repeat:
-                if isinstance(a, Input):
-                    self.toybox.apply_action(a)
-                elif type(a) == int:
-                    self.toybox.apply_ale_action(a)
-                else: assert False
+        if not self.steps_in_get_action:
+            code = action_code(action)
+            for _ in range(self.action_repeat):
+                apply_action_code(self.toybox, code)
         
         if write_json_to_file and path:
             self.write_data(path, write_json_to_file, save_states)
         else: self.next_frame_id()
 
         if save_states:
-            self.states.append(state_from_toybox(self.toybox))
+            self.states.append(self.toybox.state_to_json())
 
     
     def stopping_condition(self, maxsteps, *args, **kwargs):
         return self.toybox.game_over() or self._frame_counter > maxsteps 
 
     
-    def set_start_state(self, startstate: Union[Game, str]):
-        self.toybox.write_state_json(startstate.encode() if isinstance(startstate, Game) else startstate)
+    def set_start_state(self, startstate: Union[Game, LazyState, str]):
+        self.toybox.write_state_json(startstate.encode() if isinstance(startstate, (Game, LazyState)) else startstate)
+
 
+    def begin_play(self, path=None, write_json_to_file=True, save_states=False, startstate=None):
+        if path: os.makedirs(path, exist_ok=True)
+        if self.profiler is not None: self.profiler.attach(self)
+        if startstate: self.set_start_state(startstate)
+        self.write_data(path, write_json_to_file, save_states)
+
+    def end_play(self, path=None, maxsteps=2000, save_states=False):
+        if self._frame_counter <= maxsteps:
+            self.actions.append(None)
+            if save_states: self.states.append(None)
+
+        if self.writer is not None: self.writer.flush()
+        if path: self.save_actions(path)
+        self.close_trajectory()
+        self.stop_profiler(path)
 
     def play(self, path=None, maxsteps=2000, write_json_to_file=True, save_states=False, startstate=None):
         # set the signal handler to save actions when we are interrupted.
         signal.signal(signal.SIGINT, self.kill_and_record(path))
         signal.signal(signal.SIGTERM, self.kill_and_record(path))
         
-        if path: os.makedirs(path, exist_ok=True)
-        if startstate: self.set_start_state(startstate)
-        self.write_data(path, write_json_to_file, save_states)
+        self.begin_play(path, write_json_to_file, save_states, startstate)
 
         maxsteps = abs(maxsteps) 
 
@@ -201,8 +358,4 @@ class Agent(ABC):
             # if self._frame_counter % 10 == 0: print('STEP', self._frame_counter, maxsteps)
             self.step(path, write_json_to_file, save_states)
         
-        if self._frame_counter <= maxsteps:
-            self.actions.append(None)
-            if save_states: self.states.append(None)
- 
-        if path: self.save_actions(path)
\ No newline at end of file
+        self.end_play(path, maxsteps, save_states)
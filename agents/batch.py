@@ -0,0 +1,117 @@
+"""Generate data for many seeds across a local process pool."""
+import multiprocessing
+import os
+import random
+
+from collections import defaultdict
+from timeit import default_timer as timer
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from ctoybox import Toybox
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+from . import replay, trajectory
+from .pool import make_agent
+
+DONE_EXTENSION = '.done'
+
+
+class SeedResult(NamedTuple):
+    seed: int
+    frames: int
+    elapsed: float
+    worker: int
+
+
+def read_seeds(filename: str) -> List[int]:
+    with open(filename, 'r') as f:
+        return [int(line) for line in f if line.strip()]
+
+
+def seed_path(output: str, seed: int) -> str:
+    return output + os.sep + str(seed)
+
+
+def is_complete(output: str, agentclass: str, seed: int) -> bool:
+    """A seed is complete once its run finished and wrote the marker file."""
+    return os.path.exists(seed_path(output, seed) + os.sep + agentclass + DONE_EXTENSION)
+
+
+def read_start_state(filename: Optional[str], frame=1):
+    """The state to start from: a .json state, or ``frame`` of a .traj or .replay file (None without ``filename``)."""
+    if not filename:
+        return None
+    if filename.endswith(trajectory.EXTENSION):
+        with trajectory.TrajectoryReader(filename) as reader:
+            return reader.frame(frame)
+    if filename.endswith(replay.EXTENSION):
+        with replay.Replay(filename) as r:
+            return r.frame(frame)
+    with open(filename, 'r') as f:
+        return f.read()
+
+
+def run_seed(game: str, agentclass: str, seed: int, output: str, maxsteps: int, output_format='files', writers=0, action_log='text', profile=False,
+             keyframe_interval=64, startstate: Optional[str] = None, startframe=1) -> SeedResult:
+    """Plays one seed; ``startstate`` and ``startframe`` are as for read_start_state."""
+    path = seed_path(output, seed)
+    # One agent per process, so library code using the module-level random is reproducible too.
+    random.seed(seed)
+    with Toybox(game.lower()) as tb:
+        agent = make_agent(game, agentclass, seed, tb)
+        agent.output_format = output_format
+        agent.action_log_format = action_log
+        agent.keyframe_interval = keyframe_interval
+        if writers > 0:
+            agent.use_async_output(workers=writers)
+        if profile:
+            agent.use_profiler()
+        start = timer()
+        agent.play(path, maxsteps, startstate=read_start_state(startstate, startframe))
+        agent.close_writer()
+        elapsed = timer() - start
+
+    result = SeedResult(seed, agent._frame_counter, elapsed, os.getpid())
+    with open(path + os.sep + agentclass + DONE_EXTENSION, 'w') as f:
+        ujson.dump(result._asdict(), f)
+    return result
+
+
+def _run_seed(job):
+    return run_seed(*job)
+
+
+def run_seeds(game: str, agentclass: str, seeds: Iterable[int], output: str, maxsteps: int, workers: int, output_format='files', writers=0, action_log='text', profile=False,
+              keyframe_interval=64, startstate: Optional[str] = None, startframe=1) -> List[SeedResult]:
+    """Runs every seed without completed output; reports throughput per worker process."""
+    seeds = list(seeds)
+    todo = [s for s in seeds if not is_complete(output, agentclass, s)]
+    if len(todo) < len(seeds):
+        print('Skipping {} seeds with complete output.'.format(len(seeds) - len(todo)))
+
+    jobs = [(game, agentclass, s, output, maxsteps, output_format, writers, action_log, profile, keyframe_interval, startstate, startframe)
+            for s in todo]
+    results : List[SeedResult] = []
+    start = timer()
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(_run_seed, jobs):
+            print('Seed {}: {} frames in {:.1f}s ({:.1f} frames/sec)'.format(
+                result.seed, result.frames, result.elapsed, result.frames / result.elapsed))
+            results.append(result)
+    elapsed = timer() - start
+
+    per_worker : Dict[int, List[SeedResult]] = defaultdict(list)
+    for result in results:
+        per_worker[result.worker].append(result)
+    for worker, rs in sorted(per_worker.items()):
+        frames = sum(r.frames for r in rs)
+        busy = sum(r.elapsed for r in rs)
+        print('Worker {}: {} seeds, {} frames, {:.1f} frames/sec'.format(worker, len(rs), frames, frames / busy))
+    if results:
+        print('Total: {} frames in {:.1f}s ({:.1f} frames/sec)'.format(
+            sum(r.frames for r in results), elapsed, sum(r.frames for r in results) / elapsed))
+    return results
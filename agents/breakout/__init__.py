@@ -1,20 +1,22 @@
 from abc import abstractmethod
 
-from agents.base import Agent
+from agents.base import Agent, INPUTS, NOOP, LEFT, RIGHT, BUTTON1
 from ctoybox import Toybox, Input
 import toybox.interventions.breakout as breakout
 
+from .view import BreakoutView
+
 class BreakoutAgent(Agent):
 
   def __init__(self, *args, **kwargs):
     super().__init__(*args, **kwargs)
+    # Read-only; policies that need to change the state use BreakoutIntervention.
+    self.view = BreakoutView(self.toybox)
 
   @abstractmethod
   def get_action(self) -> Input: pass
 
-  def play(self, *args, **kwargs):
+  def begin_play(self, *args, **kwargs):
     # Breakout needs the agent to ask for a new ball to start the game
-    input = Input()
-    input.button1 = True
-    self.toybox.apply_action(input)
-    super().play(*args, **kwargs)
\ No newline at end of file
+    self.toybox.apply_action(INPUTS[BUTTON1])
+    super().begin_play(*args, **kwargs)
\ No newline at end of file
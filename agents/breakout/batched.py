@@ -0,0 +1,239 @@
+"""Vectorized scripted Breakout policies over many games at once.
+
+Each policy takes the ball and paddle positions of N games as arrays, plus
+an array of uniform draws, and returns N action codes (see
+``agents.base.INPUTS``). The decision rules are those of the scalar
+agents, but the draws come from one ``RandomState`` per batch, so a batch
+reproduces the agents' behaviour in distribution, not their exact runs.
+
+``BatchedRunner`` steps the games in lockstep and writes each run as a
+``.traj`` file and a binary action log, which ``scripts/make_csvs.py`` reads
+like any other agent's output:
+
+    python -m agents.breakout.batched --policy StayAliveJitter --seeds 1 2 3 --output output
+"""
+import os
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy
+
+from ctoybox import Toybox
+
+from agents.actionlog import write_action_log, INPUT, EXTENSION as ACTION_LOG_EXTENSION
+from agents.base import INPUTS, NOOP, LEFT, RIGHT, BUTTON1, NO_ACTION, ACTION_STRINGS
+from agents.pool import new_game
+from agents.trajectory import TrajectoryWriter, trajectory_file
+
+from .columns import BrickColumnIndex
+
+
+class Observations(NamedTuple):
+    has_ball: numpy.ndarray
+    ballx: numpy.ndarray
+    bally: numpy.ndarray
+    paddlex: numpy.ndarray
+    paddley: numpy.ndarray
+    # (N, columns): whether each column is a channel.
+    channels: numpy.ndarray
+    # Per column: x of its center and the larger side of its bricks.
+    col_x: numpy.ndarray
+    col_width: numpy.ndarray
+
+
+class BatchedPolicy(ABC):
+    """Per-game memory lives in arrays; ``draws`` has ``draws_per_step`` columns."""
+
+    draws_per_step = 0
+
+    def __init__(self, n: int):
+        self.n = n
+
+    @abstractmethod
+    def act(self, obs: Observations, draws: numpy.ndarray) -> numpy.ndarray: pass
+
+
+class StayAliveJitter(BatchedPolicy):
+
+    draws_per_step = 4
+
+    def __init__(self, n: int, jitter=0.3):
+        super().__init__(n)
+        self.jitter = jitter
+        self.prev_ballx = numpy.full(n, numpy.nan)
+
+    def act(self, obs, draws):
+        prev = numpy.where(numpy.isnan(self.prev_ballx), obs.ballx, self.prev_ballx)
+        left = (obs.ballx < obs.paddlex) & (obs.ballx < prev) & (draws[:, 0] > self.jitter)
+        right = ~left & (obs.ballx > obs.paddlex) & (obs.ballx > prev) & (draws[:, 1] > self.jitter)
+        jitter = ~left & ~right & (draws[:, 2] < self.jitter)
+        codes = numpy.where(left, LEFT,
+                numpy.where(right, RIGHT,
+                numpy.where(jitter, numpy.where(draws[:, 3] < 0.5, LEFT, RIGHT), NOOP)))
+        self.prev_ballx = numpy.where(obs.has_ball, obs.ballx, self.prev_ballx)
+        return numpy.where(obs.has_ball, codes, NOOP).astype(numpy.uint8)
+
+
+class MoveOnlyFalling(BatchedPolicy):
+
+    def __init__(self, n: int):
+        super().__init__(n)
+        self.prev_bally = numpy.full(n, numpy.nan)
+
+    def act(self, obs, draws):
+        # Comparisons with nan are False, so nothing moves on the first frame.
+        falling = obs.has_ball & (obs.bally > self.prev_bally)
+        self.prev_bally = numpy.where(obs.has_ball, obs.bally, self.prev_bally)
+        codes = numpy.where(falling & (obs.ballx < obs.paddlex), LEFT,
+                numpy.where(falling & (obs.ballx > obs.paddlex), RIGHT, NOOP))
+        return codes.astype(numpy.uint8)
+
+
+class SmarterStayAlive(BatchedPolicy):
+
+    draws_per_step = 1
+
+    def __init__(self, n: int):
+        super().__init__(n)
+        self.prev_ballx = numpy.full(n, numpy.nan)
+
+    def act(self, obs, draws):
+        prev = numpy.where(numpy.isnan(self.prev_ballx), obs.ballx, self.prev_ballx)
+        left = (obs.ballx < obs.paddlex) & (obs.ballx < prev)
+        right = ~left & (obs.ballx > obs.paddlex) & (obs.ballx > prev)
+
+        # The first channel that is an outer column or lies under the paddle decides.
+        ncols = len(obs.col_x)
+        cols = numpy.arange(ncols)
+        paddlex = obs.paddlex[:, None]
+        under = (paddlex > obs.col_x - obs.col_width / 2) & (paddlex < obs.col_x + obs.col_width / 2)
+        candidates = obs.channels & ((cols == 0) | (cols == ncols - 1) | under)
+        first = candidates.argmax(axis=1)
+        channel = numpy.where(first == 0, LEFT,
+                  numpy.where(first == ncols - 1, RIGHT,
+                  numpy.where(draws[:, 0] < 0.6, LEFT, NOOP)))
+
+        codes = numpy.where(left, LEFT,
+                numpy.where(right, RIGHT,
+                numpy.where(candidates.any(axis=1), channel, NOOP)))
+        self.prev_ballx = numpy.where(obs.has_ball, obs.ballx, self.prev_ballx)
+        return numpy.where(obs.has_ball, codes, NOOP).astype(numpy.uint8)
+
+
+POLICIES = {cls.__name__: cls for cls in [StayAliveJitter, MoveOnlyFalling, SmarterStayAlive]}
+
+
+class BatchedRunner(object):
+    """Plays one batched policy on a fresh game per seed, in lockstep."""
+
+    def __init__(self, policy: str, seeds: Sequence[int], rng_seed: Optional[int] = None):
+        self.name = policy
+        self.seeds = list(seeds)
+        self.toyboxes = [new_game('breakout', seed) for seed in self.seeds]
+        for tb in self.toyboxes:
+            # As BreakoutAgent.begin_play
+            tb.apply_action(INPUTS[BUTTON1])
+        self.policy = POLICIES[policy](len(self.seeds))
+        self.rng = numpy.random.RandomState(self.seeds[0] if rng_seed is None else rng_seed)
+        self.active = numpy.ones(len(self.seeds), dtype=bool)
+        self.actions : List[List[int]] = [[] for _ in self.seeds]
+        self._indices : List[Optional[BrickColumnIndex]] = [None] * len(self.seeds)
+        self._geometry = None
+
+    def close(self):
+        for tb in self.toyboxes:
+            tb.__exit__(None, None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def observe(self, states: Sequence[Dict[str, Any]]) -> Observations:
+        n = len(states)
+        has_ball = numpy.zeros(n, dtype=bool)
+        ball = numpy.zeros((n, 2))
+        paddle = numpy.zeros((n, 2))
+        channels = None
+        for i, js in enumerate(states):
+            bricks = js['bricks']
+            index = self._indices[i]
+            if index is None or not index.fits(bricks):
+                index = self._indices[i] = BrickColumnIndex(bricks)
+            index.update([brick['alive'] for brick in bricks])
+            if self._geometry is None:
+                firsts = [bricks[column[0]] for column in index.columns]
+                self._geometry = (numpy.array([b['position']['x'] for b in firsts], dtype=float),
+                                  numpy.array([max(b['size']['x'], b['size']['y']) for b in firsts], dtype=float))
+            if channels is None:
+                channels = numpy.zeros((n, index.num_columns), dtype=bool)
+            channels[i] = numpy.asarray(index.counts) == 0
+            if js['balls']:
+                has_ball[i] = True
+                pos = js['balls'][0]['position']
+                ball[i] = (pos['x'], pos['y'])
+            pos = js['paddle']['position']
+            paddle[i] = (pos['x'], pos['y'])
+        col_x, col_width = self._geometry
+        return Observations(has_ball, ball[:, 0], ball[:, 1], paddle[:, 0], paddle[:, 1], channels, col_x, col_width)
+
+    def run(self, maxsteps=2000, output: Optional[str] = None):
+        """Plays until every game is over or has run ``maxsteps`` frames."""
+        paths = [os.sep.join([output, self.name, str(seed)]) if output else None for seed in self.seeds]
+        writers : List[Optional[TrajectoryWriter]] = [None] * len(self.seeds)
+        for i, path in enumerate(paths):
+            if path:
+                os.makedirs(path, exist_ok=True)
+                writers[i] = TrajectoryWriter(trajectory_file(path, self.name),
+                    game='breakout', agent=self.name, seed=self.seeds[i], action_repeat=1)
+
+        frame = 1
+        states = [tb.state_to_json() for tb in self.toyboxes]
+        while True:
+            for i in numpy.flatnonzero(self.active):
+                if writers[i] is not None: writers[i].append(frame, states[i])
+            self.active &= numpy.array([not tb.game_over() for tb in self.toyboxes])
+            if frame > maxsteps or not self.active.any():
+                break
+
+            # Finished games keep their last state; their codes are ignored.
+            draws = self.rng.random_sample((len(self.seeds), self.policy.draws_per_step))
+            codes = self.policy.act(self.observe(states), draws)
+            for i in numpy.flatnonzero(self.active):
+                code = codes[i]
+                self.toyboxes[i].apply_action(INPUTS[code])
+                self.actions[i].append(int(code))
+                states[i] = self.toyboxes[i].state_to_json()
+            frame += 1
+
+        for i, path in enumerate(paths):
+            # As Agent.end_play: runs that ended before maxsteps log a final missing action.
+            if len(self.actions[i]) < maxsteps:
+                self.actions[i].append(NO_ACTION)
+            if writers[i] is not None:
+                writers[i].close([ACTION_STRINGS[c] for c in self.actions[i]],
+                    action_codes=self.actions[i], last_frame=len(writers[i].frames))
+            if path:
+                write_action_log(path + os.sep + self.name + ACTION_LOG_EXTENSION, self.actions[i], INPUT,
+                    agent=self.name, seed=self.seeds[i], action_repeat=1)
+
+
+if __name__ == '__main__':
+    import argparse
+    from timeit import default_timer as timer
+
+    parser = argparse.ArgumentParser(description='Play a batched scripted Breakout policy on many seeds at once.')
+    parser.add_argument('--policy',   required=True, choices=sorted(POLICIES))
+    parser.add_argument('--seeds',    required=True, type=int, nargs='+')
+    parser.add_argument('--maxsteps', default=2000, type=int)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with BatchedRunner(args.policy, args.seeds) as runner:
+        start = timer()
+        runner.run(args.maxsteps, args.output)
+        elapsed = timer() - start
+    frames = sum(len(a) for a in runner.actions)
+    print('{} games, {} frames in {:.1f}s ({:.1f} frames/sec)'.format(len(args.seeds), frames, elapsed, frames / elapsed))
@@ -0,0 +1,69 @@
+"""Per-column brick bookkeeping for Breakout.
+
+``BrickColumnIndex`` is built once from a board's bricks and then fed the
+brick alive flags each frame. Only bricks whose flag changed since the last
+update touch the per-column counts, the channel list and the board
+bitmasks, so policies and feature extraction can ask for them in O(1).
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class BrickColumnIndex(object):
+
+    def __init__(self, bricks: Sequence[Dict[str, Any]]):
+        """``bricks`` are brick JSON objects in state order."""
+        ncols = max(brick['col'] for brick in bricks) + 1
+        # Brick indices per column, in state order (as BreakoutIntervention.get_column).
+        self.columns : List[List[int]] = [[] for _ in range(ncols)]
+        for i, brick in enumerate(bricks):
+            self.columns[brick['col']].append(i)
+        self.nrows = len(self.columns[0])
+        self.col_of = [brick['col'] for brick in bricks]
+        # Bit of each brick in the column-major board encoding used by make_csvs.
+        self.board_bit = [0] * len(bricks)
+        for c, column in enumerate(self.columns):
+            for j, i in enumerate(column):
+                self.board_bit[i] = c * self.nrows + j
+
+        self.counts = [0] * ncols
+        self.channels : List[int] = list(range(ncols))
+        # Alive bricks as bits: by state index, and column-major.
+        self.alive_mask = 0
+        self.board_alive = 0
+        self._alive : Optional[List[bool]] = None
+
+    def __len__(self):
+        return len(self.col_of)
+
+    @property
+    def num_columns(self) -> int:
+        return len(self.columns)
+
+    @property
+    def num_alive(self) -> int:
+        return bin(self.alive_mask).count('1')
+
+    def fits(self, bricks: Sequence[Any]) -> bool:
+        return len(bricks) == len(self.col_of)
+
+    def update(self, alive: Sequence[bool]) -> bool:
+        """Applies the current alive flags; returns whether anything changed."""
+        alive = list(alive)
+        if alive == self._alive:
+            return False
+        prev = self._alive or [False] * len(alive)
+        for i, (now, before) in enumerate(zip(alive, prev)):
+            if now == before: continue
+            self.counts[self.col_of[i]] += 1 if now else -1
+            self.alive_mask ^= 1 << i
+            self.board_alive ^= 1 << self.board_bit[i]
+        self.channels = [c for c, n in enumerate(self.counts) if n == 0]
+        self._alive = alive
+        return True
+
+    def is_channel(self, col: int) -> bool:
+        return self.counts[col] == 0
+
+    def targets(self) -> List[int]:
+        """Columns that still have bricks, fewest first (ties in column order)."""
+        return sorted((c for c, n in enumerate(self.counts) if n > 0), key=self.counts.__getitem__)
@@ -1,5 +1,4 @@
 from . import *
-from random import random, seed
 
 
 class MoveOnlyFalling(BreakoutAgent):
@@ -11,13 +10,12 @@ class MoveOnlyFalling(BreakoutAgent):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        seed(self.seed)
         self.ball_moving_down = None
         self.ball_prevY = None
 
     def get_action(self):
-        input = Input()
-        with breakout.BreakoutIntervention(self.toybox) as intervention:
+        action = NOOP
+        with self.view as intervention:
             game = intervention.game
             bally = game.balls[0].position.y
 
@@ -30,8 +28,8 @@ class MoveOnlyFalling(BreakoutAgent):
                 ballx = game.balls[0].position.x
                 paddlex = game.paddle.position.x
                 if ballx < paddlex:
-                    input.left = True
+                    action = LEFT
                 elif ballx > paddlex:
-                    input.right = True
+                    action = RIGHT
 
-        return input
\ No newline at end of file
+        return INPUTS[action]
\ No newline at end of file
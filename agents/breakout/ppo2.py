@@ -1,41 +1,60 @@
 from . import *
-from toybox.testing.models.openai_baselines import getModel
 from toybox.testing.envs.gym import get_turtle
 from toybox.interventions.breakout import BreakoutIntervention
-from baselines.common.vec_env.vec_frame_stack import VecFrameStack
-from baselines.common.cmd_util import make_vec_env
+from agents.inference import InferenceServer, shared_server, baselines_server
+from agents.numpy_policy import NumpyPolicy, weights_file
+from agents.envs import share_toybox, make_vec_env, RingFrameStack
 
-import tensorflow as tf
 import numpy
 
 class PPO2(BreakoutAgent):
 
-    def __init__(self, toybox: Toybox, *args, withstate=None, model_path='agents/data/BreakoutToyboxNoFrameskip-v4.regress.model', **kwargs):
+    def __init__(self, toybox: Toybox, *args, withstate=None, model_path='agents/data/BreakoutToyboxNoFrameskip-v4.regress.model',
+                 shared_model=False, max_batch=32, backend='tensorflow', weights_path=None, fast_downscale=False, **kwargs):
         # The action_repeat value comes from the skip argument of 
         # MaxAndSkipEnv in atari_wrappers.py
         super().__init__(toybox, *args, **kwargs)
 
         nenv = 1
         frame_stack_size = 4
-        env_type = 'atari'
         env_id = 'BreakoutToyboxNoFrameskip-v4'
         family = 'ppo2'
  
         # Nb: OpenAI special cases acer, trpo, and deepQ.
-        env = VecFrameStack(make_vec_env(env_id, env_type, nenv, self.seed), frame_stack_size)
+        env = RingFrameStack(make_vec_env(env_id, nenv, self.seed, fast_downscale), frame_stack_size)
+        # The env steps the agent's own Toybox, so there is no state to mirror.
+        share_toybox(env, toybox)
+        self.steps_in_get_action = True
         obs = env.reset()
         self.obs = obs
 
         self.turtle = get_turtle(env)
-        self.turtle.toybox.set_seed(self.seed)
-        self.toybox = toybox
-        self._reset_seed(self.seed)
-        if withstate: self.turtle.toybox.write_state_json(withstate)
+        self._reset_seed(self.seed, self.seed_toybox)
+        if withstate: self.toybox.write_state_json(withstate)
 
-        self.model = getModel(env, family, self.seed, model_path)
+        if backend == 'numpy':
+            # Weights from `python -m agents.numpy_policy export`; no TensorFlow model is loaded.
+            weights = weights_path or weights_file(model_path)
+            load_model = lambda: NumpyPolicy.load(weights, self.seed)
+            load_server = lambda: InferenceServer(load_model().step, max_batch=max_batch)
+        else:
+            from toybox.testing.models.openai_baselines import getModel
+            load_model = lambda: getModel(env, family, self.seed, model_path)
+            load_server = lambda: baselines_server(env_id, family, self.seed, model_path, frame_stack_size, max_batch)
+
+        if shared_model:
+            # Load the model once per process and run it on many agents' observations at once.
+            self.inference = shared_server((env_id, family, model_path, backend), load_server)
+            self.model = None
+        else:
+            self.inference = None
+            self.model = load_model()
         self.env = env
         self.done = False
-        self.tfsession = tf.Session(graph=tf.Graph()).__enter__()
+        self.tfsession = None
+        if backend != 'numpy':
+            import tensorflow as tf
+            self.tfsession = tf.Session(graph=tf.Graph()).__enter__()
 
     def __del__(self):
         # EMT (25/05/2020)
@@ -54,27 +73,28 @@ class PPO2(BreakoutAgent):
     def stopping_condition(self, maxsteps):
         return super().stopping_condition(maxsteps) or self.done
 
-    def reset(self, seed=None):
+    def reset(self, seed=None, fresh_session=False):
+        """Starts a new episode; the model's graph and weights are kept.
+
+        ``fresh_session`` also replaces the TensorFlow session, which is what
+        every reset used to do (see scripts/bench_reset.py).
+        """
         super().reset(seed=seed)
         
         self.done = False
 
         # turtle = get_turtle(self.env)
         # turtle.toybox.new_game()
-        self.turtle.toybox.new_game()
-        if seed: self.turtle.toybox.set_seed(seed)
-        
+        # super().reset already started a new game on the shared toybox.
         self.obs = self.env.reset()
 
-        self.tfsession.__del__()
-        self.tfsession = tf.Session(graph=tf.Graph()).__enter__()
-
-    def set_start_state(self, startstate):
-        super().set_start_state(startstate)
-        self.turtle.toybox.write_state_json(startstate.encode())
+        if fresh_session and self.tfsession is not None:
+            import tensorflow as tf
+            self.tfsession.__del__()
+            self.tfsession = tf.Session(graph=tf.Graph()).__enter__()
 
     def get_action(self):
-        action = self.model.step(self.obs)[0]
+        action = (self.inference.predict(self.obs) if self.inference else self.model.step(self.obs))[0]
         obs, _, done, info = self.env.step(action)
 
         assert type(done) is numpy.ndarray and len(done) == 1, type(done)
@@ -83,6 +103,4 @@ class PPO2(BreakoutAgent):
         self.done = done
 
         ale_action = self.toybox.get_legal_action_set()[action[0]]
-        # Frameskip workaround
-        self.toybox.write_state_json(self.turtle.toybox.state_to_json())
         return int(ale_action) if not done else None
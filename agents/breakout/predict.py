@@ -0,0 +1,47 @@
+"""Where the Breakout ball will cross the paddle line.
+
+The ball travels in a straight line and reflects off the side walls, so its
+crossing point is the linear projection folded back into the playfield.
+``predict_crossing`` is memoized on (position, velocity, line, walls): within
+a frame, the agent, outcome predicates and the driver all ask about the same
+ball, and replayed or intervened states repeat positions often.
+"""
+from functools import lru_cache
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+
+class Crossing(NamedTuple):
+    x: float
+    # Frames until the ball reaches the line, and how many walls it hits on the way.
+    frames: float
+    bounces: int
+
+
+@lru_cache(maxsize=1 << 16)
+def predict_crossing(x: float, y: float, vx: float, vy: float, line_y: float, left: float, right: float) -> Optional[Crossing]:
+    """None unless the ball is above ``line_y`` and moving down (y grows downward)."""
+    if vy <= 0 or y > line_y:
+        return None
+    frames = (line_y - y) / vy
+    offset = x + vx * frames - left
+    width = right - left
+    if width <= 0:
+        return Crossing(left + offset, frames, 0)
+    bounces = abs(int(offset // width))
+    offset %= 2 * width
+    return Crossing(left + (offset if offset <= width else 2 * width - offset), frames, bounces)
+
+
+def walls(bricks: Sequence) -> Tuple[float, float]:
+    """The outer edges of the brick wall, which spans the playfield; constant for a board."""
+    return (min(brick.position.x - brick.size.x / 2. for brick in bricks),
+            max(brick.position.x + brick.size.x / 2. for brick in bricks))
+
+
+def predict_state(state, bounds: Tuple[float, float]) -> Optional[Crossing]:
+    """The crossing of the first ball in ``state`` (a Game, LazyState or view) with the paddle line."""
+    if not len(state.balls):
+        return None
+    ball = state.balls[0]
+    return predict_crossing(ball.position.x, ball.position.y, ball.velocity.x, ball.velocity.y,
+                            state.paddle.position.y, bounds[0], bounds[1])
@@ -5,13 +5,13 @@ class StayAlive(BreakoutAgent):
     """The simplest agent. Reacts deterministically to the x position of the ball."""
 
     def get_action(self):
-        input = Input()
-        with breakout.BreakoutIntervention(self.toybox) as intervention:
+        action = NOOP
+        with self.view as intervention:
             game = intervention.game
             ballx = game.balls[0].position.x
             paddlex = game.paddle.position.x
             if ballx < paddlex:
-                input.left = True
+                action = LEFT
             elif ballx > paddlex:
-                input.right = True
-        return input
\ No newline at end of file
+                action = RIGHT
+        return INPUTS[action]
\ No newline at end of file
@@ -1,7 +1,4 @@
-from random import random, seed, randint
-from ctoybox import Input
-from . import BreakoutAgent
-from toybox.interventions.breakout import BreakoutIntervention
+from . import BreakoutAgent, INPUTS, NOOP, LEFT, RIGHT
 
 
 class StayAliveJitter(BreakoutAgent):
@@ -11,13 +8,12 @@ class StayAliveJitter(BreakoutAgent):
         self.jitter = 0.3
         self.prev_ballx = None
         super().__init__(*args, **kwargs)
-        seed(self.seed)
 
     def get_action(self, intervention=None):
-        input = Input()
-        with (intervention or BreakoutIntervention(self.toybox)) as intervention:
+        action = NOOP
+        with (intervention or self.view) as intervention:
             game = intervention.game
-            if len(game.balls) == 0: return input
+            if len(game.balls) == 0: return INPUTS[action]
             ballx = game.balls[0].position.x
             paddlex = game.paddle.position.x
 
@@ -25,16 +21,16 @@ class StayAliveJitter(BreakoutAgent):
             if self.prev_ballx is None:
                 self.prev_ballx = ballx
 
-            if ballx < paddlex and ballx < self.prev_ballx and random() > self.jitter:
-                input.left = True
-            elif ballx > paddlex and ballx > self.prev_ballx and random() > self.jitter:
-                input.right = True
-            elif random() < self.jitter:
-                if random() < 0.5:
-                    input.left = True
+            if ballx < paddlex and ballx < self.prev_ballx and self.rng.random() > self.jitter:
+                action = LEFT
+            elif ballx > paddlex and ballx > self.prev_ballx and self.rng.random() > self.jitter:
+                action = RIGHT
+            elif self.rng.random() < self.jitter:
+                if self.rng.random() < 0.5:
+                    action = LEFT
                 else:
-                    input.right = True
+                    action = RIGHT
 
             self.prev_ballx = ballx
             
-        return input
+        return INPUTS[action]
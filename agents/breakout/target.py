@@ -1,6 +1,5 @@
 from . import *
 from .stayalivejitter import StayAliveJitter
-from random import random, seed, randint
 
 import logging
 
@@ -12,11 +11,10 @@ class Target(StayAliveJitter):
         self.prev_bally = None
         self.score = 0
         super().__init__(*args, **kwargs)
-        seed(self.seed)
 
     def get_action(self):
-        input = Input()
-        with breakout.BreakoutIntervention(self.toybox) as intervention:
+        action = NOOP
+        with self.view as intervention:
             game = intervention.game
             # We missed in the previous round; game over.
             if len(game.balls) == 0: return   
@@ -42,20 +40,17 @@ class Target(StayAliveJitter):
             # get the column with the fewest bricks greater than zero
             # if there is one brick, stop early
 
-            # Start by shuffling the columns
-            columns = [intervention.get_column(i) for i in range(intervention.num_columns())]
-
             # Get list of potential targets -- i.e., columns that are not yet completed.
-            num_alive = [sum([int(brick.alive) for brick in this_col]) for this_col in columns]
-            targets = sorted([t for t in zip(num_alive, columns) if t[0] > 0], key=lambda t: t[0])
+            index = intervention.index
+            targets = index.targets()
             if game.score > self.score:
                 self.score = game.score
                 if logging.root.level == logging.INFO:
-                    for n, c in targets:
-                        print('%d bricks in column %d' % (n, c[0].col))
+                    for c in targets:
+                        print('%d bricks in column %d' % (index.counts[c], c))
 
             # Target the column closest to completion
-            target_brick = targets[0][1][0]
+            target_brick = intervention.get_column(targets[0])[0]
             colx = target_brick.position.x
             logging.info('Targeting column %d\n\tprev_ballx: %d\tballx: %d\tbally: %d\tpaddlex: %d\tcolx: %d' % (
                     target_brick.col,
@@ -65,15 +60,14 @@ class Target(StayAliveJitter):
                     colx))
             
 
-            # Predict number of time steps until the ball crosses the x axis
-            # We should be heading down from here (otherwise we would have triggered the super method)
-            # We know that the ball bounces off the wall, but we are not modeling that for now.
-            px_per_frame = (abs(self.prev_ballx - ballx) + abs(self.prev_bally - bally)) / 2.
-            logging.info('\tPixels per frame', px_per_frame)
-            steps_until_x_cross = (paddley - bally) / px_per_frame
+            # Predict where the ball crosses the paddle line, bouncing off the walls.
+            crossing = intervention.predict()
+            if crossing is None:
+                self.prev_bally = bally
+                return super().get_action(intervention=intervention)
+            steps_until_x_cross = crossing.frames
             logging.info('\tEstimated number of steps until x crosses the axis', steps_until_x_cross)
-            ball_move_right = self.prev_ballx < ballx
-            projected_x_cross = ballx + (steps_until_x_cross * px_per_frame * (1 if ball_move_right else -1))
+            projected_x_cross = crossing.x
             dx = 4
             logging.info('\tProjected x cross', projected_x_cross)
             # If the ball crosses the x-axis near the target column, just try to align the paddle like normal
@@ -83,44 +77,44 @@ class Target(StayAliveJitter):
             elif colx < projected_x_cross:
                 if steps_until_x_cross < dx:
                     if paddlex == projected_x_cross:
-                        if random() > self.jitter:
+                        if self.rng.random() > self.jitter:
                             logging.info('Column to left; paddle at cross; Random move right')
-                            input.right = True
+                            action = RIGHT
                     # If the paddle is to the left, move to the right
                     elif paddlex < projected_x_cross:
                         logging.info('Column to left; paddle to left; Move right')
-                        input.right = True
+                        action = RIGHT
                     # Then the paddle is to the right
                     else:
                         # Make sure the paddle isn't too far to the right
                         if paddlex - (0.5 * paddle_width) > projected_x_cross:
                             logging.info('Column to left; paddle too far right; Move left')
-                            input.left =  True
-                        elif random() > self.jitter:
+                            action = LEFT
+                        elif self.rng.random() > self.jitter:
                             logging.info('Column to left; paddle to right; Random move left.')
-                            input.left = True
+                            action = LEFT
                 else: return super().get_action(intervention=intervention)
             # The target column is to the right of the projected cross
             else:
                 if paddlex == projected_x_cross:
-                    if random() > self.jitter:
+                    if self.rng.random() > self.jitter:
                         logging.info('Column to right; paddle under; random move left.')
-                        input.left = True
+                        action = LEFT
                 # If the center of the paddle is to the left of the projected cross
                 elif paddlex < projected_x_cross:
                     if paddlex + (0.5 * paddle_width) < projected_x_cross:
                         logging.info('Column to right; paddle too far left; move right')
-                        input.right = True
-                    elif random() > self.jitter:
+                        action = RIGHT
+                    elif self.rng.random() > self.jitter:
                         logging.info('Column to right; random move right')
-                        input.right = True
+                        action = RIGHT
                 # Paddle is too far to the right
                 else:
                     logging.info('Column to right; Paddle too far right; move left.')
-                    input.left = True
+                    action = LEFT
 
 
             self.prev_ballx = ballx
             self.prev_bally = bally
 
-            return input
\ No newline at end of file
+            return INPUTS[action]
\ No newline at end of file
@@ -1,5 +1,4 @@
 from . import *
-from random import random, seed
 
 
 class VelocityEstimate(BreakoutAgent):
@@ -18,7 +17,6 @@ class VelocityEstimate(BreakoutAgent):
         self.prev_bally = None
         self.score = 0
         super().__init__( *args, **kwargs)
-        seed(self.seed)
         self.ball_prevY = None
         self.ball_prevX = None
         self.ball_moving_down = None
@@ -32,8 +30,8 @@ class VelocityEstimate(BreakoutAgent):
         pass
 
     def get_action(self):
-        input = Input()
-        with breakout.BreakoutIntervention(self.toybox) as intervention:
+        action = NOOP
+        with self.view as intervention:
             game = intervention.game
 
             ball_y = game.balls[0].position.y # current Y position of the ball
@@ -74,9 +72,9 @@ class VelocityEstimate(BreakoutAgent):
                     if abs(self.target_x - paddlex) > 4:
                         # the paddle is not at the target
                         if self.target_x > paddlex:
-                            input.right = True
+                            action = RIGHT
                         else:
-                            input.left = True
+                            action = LEFT
                     # compute new target if ball is moving down AND the ball is close to the wall
                     # this needs to be implemented smarter.
                     # right now it allows re-compute as long as you arrive the target.
@@ -86,4 +84,4 @@ class VelocityEstimate(BreakoutAgent):
                         target_x = int(self.ball_velocity_x * frames + ball_x)
                         self.target_x = max(X_min, min(X_max, target_x))
         # print(self.target_x, paddlex, self.ball_moving_down)
-        return input
\ No newline at end of file
+        return INPUTS[action]
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""A read-only stand-in for ``BreakoutIntervention`` in scripted agents.
+
+Scripted policies only read the ball, the paddle and the bricks, but
+entering a ``BreakoutIntervention`` decodes the whole state into a ``Game``
+and exiting it can write the state back. ``BreakoutView`` reads the state
+JSON once when entered and answers attribute access straight from it
+(``view.game.balls[0].position.x``); exiting does nothing.
+
+Breakout's ``query_state_json`` only answers brick questions
+(``bricks_remaining``, ``brick_live_by_index``, ``count_channels``,
+``channels``, ``num_columns``, ``num_rows``); there is no query for the
+ball or the paddle, which every policy reads each frame. So the view reads
+the whole state JSON once per frame, which brings the bricks along; fetching
+them through queries instead would cost a call per brick.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from ctoybox import Toybox
+
+from agents.lazy import JsonView, JsonList
+
+from .columns import BrickColumnIndex
+from .predict import Crossing, predict_state, walls as wall_bounds
+
+
+class BreakoutView(object):
+
+    def __init__(self, toybox: Toybox):
+        self.toybox = toybox
+        self._js : Optional[Dict[str, Any]] = None
+        self._depth = 0
+        # Per-frame caches, cleared on refresh.
+        self._alive : Optional[List[bool]] = None
+        self._columns : Optional[List[List[JsonView]]] = None
+        self._index_fresh = False
+        # Per-board caches, rebuilt when the bricks no longer fit the index.
+        self._index : Optional[BrickColumnIndex] = None
+        self._walls = None
+
+    def __enter__(self):
+        # Nested uses (e.g., Target calling StayAliveJitter) share one read.
+        if self._depth == 0:
+            self.refresh()
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+
+    def refresh(self):
+        self._js = self.toybox.state_to_json()
+        self._alive = None
+        self._columns = None
+        self._index_fresh = False
+
+    def json(self) -> Dict[str, Any]:
+        if self._js is None:
+            self.refresh()
+        return self._js
+
+    @property
+    def game(self) -> JsonView:
+        return JsonView(self.json())
+
+    @property
+    def balls(self) -> JsonList:
+        return JsonList(self.json()['balls'])
+
+    @property
+    def paddle(self) -> JsonView:
+        return JsonView(self.json()['paddle'])
+
+    @property
+    def paddle_width(self) -> float:
+        return self.json()['paddle_width']
+
+    @property
+    def score(self) -> int:
+        return self.json()['score']
+
+    @property
+    def alive(self) -> List[bool]:
+        """The alive flag of every brick, in state order."""
+        if self._alive is None:
+            self._alive = [brick['alive'] for brick in self.json()['bricks']]
+        return self._alive
+
+    @property
+    def index(self) -> BrickColumnIndex:
+        """Alive counts and channels per column, brought up to date once per frame."""
+        if not self._index_fresh:
+            bricks = self.json()['bricks']
+            # A start state from elsewhere may have a different board.
+            if self._index is None or not self._index.fits(bricks):
+                self._index = BrickColumnIndex(bricks)
+                self._walls = None
+            self._index.update(self.alive)
+            self._index_fresh = True
+        return self._index
+
+    def num_columns(self) -> int:
+        return self.index.num_columns
+
+    def get_column(self, i: int) -> List[JsonView]:
+        if self._columns is None:
+            self._columns = [None] * self.num_columns()
+        if self._columns[i] is None:
+            bricks = self.json()['bricks']
+            self._columns[i] = [JsonView(bricks[j]) for j in self.index.columns[i]]
+        return self._columns[i]
+
+    def is_channel(self, column: List[JsonView]) -> bool:
+        """A channel is a column whose bricks are all gone."""
+        return self.index.is_channel(column[0].col)
+
+    def walls(self) -> Tuple[float, float]:
+        self.index  # a new board resets the walls
+        if self._walls is None:
+            self._walls = wall_bounds(self.game.bricks)
+        return self._walls
+
+    def predict(self) -> Optional[Crossing]:
+        """Where the first ball will cross the paddle line (see agents.breakout.predict)."""
+        return predict_state(self, self.walls())
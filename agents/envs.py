@@ -0,0 +1,286 @@
+"""Helpers for agents that act through a Toybox gym env.
+
+Deep agents observe the game through a gym env (with the usual Atari
+wrappers) that builds its own Toybox. ``share_toybox`` makes that env drive
+the agent's Toybox instead, so the state the driver and output writers see
+is the state the policy acts on, with no copy between the two.
+
+``RingFrameStack`` stands in for ``VecFrameStack``: rather than shifting the
+whole stacked observation every step, it writes each new frame once into a
+preallocated buffer and returns the last ``k`` frames as a strided view.
+
+``make_vec_env`` builds baselines' Atari envs in process, in a
+``DummyVecEnv`` stand-in: baselines' vec env package (and so its
+``make_vec_env``) imports TensorFlow, which agents running a NumPy policy
+never need.
+
+``DownscaledGrayscale`` can stand in for the Atari wrappers' ``WarpFrame``
+(``cvtColor`` then ``cv2.resize`` with ``INTER_AREA``): it reduces each frame
+to 84x84 grayscale through precomputed source indices and area weights,
+into preallocated buffers. It differs from OpenCV by one gray level on a
+few percent of pixels, so the saved models, trained on ``WarpFrame``, see
+slightly different inputs; ``wrap_atari`` and ``make_vec_env`` only use it
+when asked (``fast_downscale=True``).
+"""
+import random
+
+import gym
+import numpy
+
+from typing import Callable, List, Sequence, Tuple
+
+from ctoybox import Toybox
+from gym import spaces
+from toybox.testing.envs.gym import get_turtle
+
+
+def share_toybox(env, toybox: Toybox) -> Toybox:
+    """Points the Toybox env inside ``env`` at ``toybox``; returns ``toybox``.
+
+    Call before ``env.reset()``. ``toybox`` takes on the env's rendering and
+    frameskip settings, since the env's observations depend on them.
+    """
+    turtle = get_turtle(env)
+    own = turtle.toybox
+    if own is toybox:
+        return toybox
+    assert own.game_name == toybox.game_name, (own.game_name, toybox.game_name)
+    toybox.grayscale = own.grayscale
+    toybox.frames_per_action = own.frames_per_action
+    turtle.toybox = toybox
+    own.__exit__(None, None, None)
+    return toybox
+
+
+class FrameRing(object):
+    """The last ``k`` frames of ``n`` parallel episodes, as an (n, H, W, k) view.
+
+    Frames are written once into a buffer of ``capacity`` steps. When it
+    fills, the newest ``k - 1`` steps are moved to the front, so a copy of
+    the stack happens once every ``capacity - k + 1`` pushes instead of on
+    every push.
+    """
+
+    def __init__(self, n: int, frame_shape, k=4, capacity=256, dtype=numpy.uint8):
+        assert capacity > k, (capacity, k)
+        self.k = k
+        self.buffer = numpy.zeros((capacity, n) + tuple(frame_shape), dtype=dtype)
+        # The stack is buffer[end - k:end].
+        self.end = k
+
+    def reset(self, frames: numpy.ndarray, envs=slice(None)):
+        """Clears the stacks of ``envs``, leaving only ``frames`` (as VecFrameStack does on reset)."""
+        self.buffer[self.end - self.k:self.end - 1, envs] = 0
+        self.buffer[self.end - 1, envs] = frames
+
+    def push(self, frames: numpy.ndarray):
+        if self.end == len(self.buffer):
+            self.buffer[:self.k - 1] = self.buffer[self.end - self.k + 1:self.end]
+            self.end = self.k - 1
+        self.buffer[self.end] = frames
+        self.end += 1
+
+    def observation(self) -> numpy.ndarray:
+        """A view of the stacks; it is valid until the next push or reset."""
+        return numpy.moveaxis(self.buffer[self.end - self.k:self.end], 0, -1)
+
+
+class RingFrameStack(object):
+    """A drop-in for baselines' ``VecFrameStack`` over single-channel frames, backed by a ``FrameRing``.
+
+    Observations are (num_envs, H, W, k) views into the ring: a policy must
+    use each one before the next ``step``, which the agents do.
+    """
+
+    def __init__(self, venv, k=4, capacity=256):
+        self.venv = venv
+        self.k = k
+        self.num_envs = venv.num_envs
+        space = venv.observation_space
+        assert space.shape[-1] == 1, 'RingFrameStack stacks single-channel frames; got {}'.format(space.shape)
+        self.observation_space = spaces.Box(low=numpy.repeat(space.low, k, axis=-1),
+                                            high=numpy.repeat(space.high, k, axis=-1), dtype=space.dtype)
+        self.action_space = venv.action_space
+        self.ring = FrameRing(self.num_envs, space.shape[:-1], k, capacity, space.dtype)
+
+    def __getattr__(self, name):
+        # Everything else (e.g., get_images, envs) comes from the wrapped env.
+        return getattr(self.venv, name)
+
+    def reset(self) -> numpy.ndarray:
+        self.ring.reset(self.venv.reset()[..., 0])
+        return self.ring.observation()
+
+    def step_async(self, actions):
+        self.venv.step_async(actions)
+
+    def step_wait(self):
+        obs, rews, news, infos = self.venv.step_wait()
+        self.ring.push(obs[..., 0])
+        done = numpy.flatnonzero(news)
+        if len(done):
+            self.ring.reset(obs[done, ..., 0], done)
+        return self.ring.observation(), rews, news, infos
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        self.venv.close()
+
+
+def area_taps(src: int, dst: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """How ``INTER_AREA`` shrinks a line of ``src`` pixels to ``dst``: (dst, taps) source indices and weights.
+
+    Output pixel i averages the source interval [i * src / dst, (i + 1) * src / dst),
+    weighting each source pixel by how much of it the interval covers.
+    Unused taps have weight 0.
+    """
+    assert src >= dst, 'area taps only shrink ({} -> {})'.format(src, dst)
+    scale = src / dst
+    spans = [(i * scale, (i + 1) * scale) for i in range(dst)]
+    ntaps = max(int(numpy.ceil(hi)) - int(lo) for lo, hi in spans)
+    index = numpy.zeros((dst, ntaps), dtype=numpy.intp)
+    weights = numpy.zeros((dst, ntaps), dtype=numpy.float32)
+    for i, (lo, hi) in enumerate(spans):
+        for t, j in enumerate(range(int(lo), min(int(numpy.ceil(hi)), src))):
+            index[i, t] = j
+            weights[i, t] = (min(hi, j + 1) - max(lo, j)) / scale
+    return index, weights
+
+
+# ITU-R 601 luma, as cv2.COLOR_RGB2GRAY.
+LUMA = numpy.array([0.299, 0.587, 0.114], dtype=numpy.float32)
+
+
+class DownscaledGrayscale(gym.ObservationWrapper):
+    """``WarpFrame`` without OpenCV: (size, size, 1) uint8 grayscale observations.
+
+    Each output pixel is a weighted sum of the few source pixels under it,
+    gathered through precomputed indices (rows, then columns), so no
+    full-resolution intermediate is made. Matches
+    ``cv2.resize(..., interpolation=cv2.INTER_AREA)`` to within one gray level.
+    """
+
+    def __init__(self, env, size=84):
+        super().__init__(env)
+        shape = env.observation_space.shape
+        h, w = shape[:2]
+        self.channels = shape[2] if len(shape) == 3 else 1
+        self.row_index, self.row_weights = area_taps(h, size)
+        self.col_index, self.col_weights = area_taps(w, size)
+        self._rows = numpy.empty((size, w, self.channels), dtype=numpy.float32)
+        self._gray = numpy.empty((size, w), dtype=numpy.float32)
+        self._small = numpy.empty((size, size), dtype=numpy.float32)
+        self.observation_space = spaces.Box(low=0, high=255, shape=(size, size, 1), dtype=numpy.uint8)
+
+    def observation(self, frame: numpy.ndarray) -> numpy.ndarray:
+        frame = frame.reshape(frame.shape[:2] + (self.channels,))
+        numpy.einsum('ik,ikwc->iwc', self.row_weights, frame[self.row_index], out=self._rows, dtype=numpy.float32)
+        if self.channels == 1:
+            gray = self._rows[..., 0]
+        else:
+            gray = numpy.matmul(self._rows[..., :3], LUMA, out=self._gray)
+        numpy.einsum('jk,ijk->ij', self.col_weights, gray[:, self.col_index], out=self._small)
+        return numpy.rint(self._small).astype(numpy.uint8)[..., None]
+
+
+def wrap_atari(env, wrappers, frame_skip=4, size=84, episode_life=True, clip_rewards=True, fast_downscale=False,
+               monitor=lambda env: env):
+    """The DeepMind Atari preprocessing, optionally with ``DownscaledGrayscale`` in place of ``WarpFrame``.
+
+    ``wrappers`` is ``baselines.common.atari_wrappers`` or
+    ``stable_baselines3.common.atari_wrappers``; they share these classes.
+    ``monitor`` wraps the env after frame skipping, where baselines puts its ``Monitor``.
+    """
+    env = wrappers.NoopResetEnv(env, noop_max=30)
+    env = wrappers.MaxAndSkipEnv(env, skip=frame_skip)
+    env = monitor(env)
+    if episode_life:
+        env = wrappers.EpisodicLifeEnv(env)
+    if 'FIRE' in env.unwrapped.get_action_meanings():
+        env = wrappers.FireResetEnv(env)
+    if fast_downscale:
+        env = DownscaledGrayscale(env, size)
+    else:
+        env = wrappers.WarpFrame(env, width=size, height=size)
+    if clip_rewards:
+        env = wrappers.ClipRewardEnv(env)
+    return env
+
+
+class InProcessVecEnv(object):
+    """A drop-in for baselines' ``DummyVecEnv``: steps each env in turn, resetting those that finish."""
+
+    def __init__(self, env_fns: Sequence[Callable[[], gym.Env]]):
+        self.envs : List[gym.Env] = [fn() for fn in env_fns]
+        self.num_envs = len(self.envs)
+        self.observation_space = self.envs[0].observation_space
+        self.action_space = self.envs[0].action_space
+        self.spec = self.envs[0].spec
+        space = self.observation_space
+        self.buf_obs = numpy.zeros((self.num_envs,) + tuple(space.shape), dtype=space.dtype)
+        self.buf_rews = numpy.zeros(self.num_envs, dtype=numpy.float32)
+        self.buf_dones = numpy.zeros(self.num_envs, dtype=bool)
+        self.buf_infos = [{} for _ in range(self.num_envs)]
+        self.actions = None
+
+    def reset(self) -> numpy.ndarray:
+        for e, env in enumerate(self.envs):
+            self.buf_obs[e] = env.reset()
+        return self.buf_obs.copy()
+
+    def step_async(self, actions):
+        try:
+            listify = len(actions) != self.num_envs
+        except TypeError:
+            listify = True
+        if listify:
+            assert self.num_envs == 1, 'one action for {} envs'.format(self.num_envs)
+            actions = [actions]
+        self.actions = actions
+
+    def step_wait(self):
+        for e, env in enumerate(self.envs):
+            obs, self.buf_rews[e], self.buf_dones[e], self.buf_infos[e] = env.step(self.actions[e])
+            if self.buf_dones[e]:
+                obs = env.reset()
+            self.buf_obs[e] = obs
+        return self.buf_obs.copy(), self.buf_rews.copy(), self.buf_dones.copy(), list(self.buf_infos)
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def get_images(self):
+        return [env.render(mode='rgb_array') for env in self.envs]
+
+    def close(self):
+        for env in self.envs:
+            env.close()
+
+
+def make_vec_env(env_id: str, num_envs: int, seed=None, fast_downscale=False) -> InProcessVecEnv:
+    """In-process Atari envs, as baselines' ``make_vec_env(env_id, 'atari', ..., force_dummy=True)``.
+
+    Like baselines, this seeds the ``random`` and ``numpy.random`` streams
+    with ``seed`` (TensorFlow's is left to whichever model is loaded). With
+    ``fast_downscale``, ``DownscaledGrayscale`` replaces ``WarpFrame``.
+    """
+    # Neither module imports TensorFlow.
+    from baselines.bench import Monitor
+    from baselines.common import atari_wrappers
+
+    random.seed(seed)
+    numpy.random.seed(seed)
+
+    def make_env(rank):
+        def thunk():
+            env = gym.make(env_id)
+            assert 'NoFrameskip' in env.spec.id, env.spec.id
+            env.seed(None if seed is None else seed + rank)
+            return wrap_atari(env, atari_wrappers, fast_downscale=fast_downscale,
+                              monitor=lambda env: Monitor(env, None, allow_early_resets=True))
+        return thunk
+    return InProcessVecEnv([make_env(i) for i in range(num_envs)])
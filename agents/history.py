@@ -0,0 +1,141 @@
+"""Compact in-memory history of the states an agent visited.
+
+Rather than a full ``Game`` object tree per frame, ``StateHistory`` keeps a
+serialized keyframe every ``keyframe_interval`` frames and, in between, only
+the JSON fields that changed since the previous frame. States are rebuilt
+when indexed, so code that treats ``Agent.states`` as a list (outcome
+predicates, ``zip(agent.states, agent.actions)``, slicing) keeps working.
+Indexing returns a ``LazyState``, so predicates that only read the balls and
+paddle never build the full object tree.
+
+Undecoded states are cached (least recently used first out) and rebuilt
+after eviction. A state that has been decoded may have been changed by its
+caller, so it is never evicted: indexing it again returns the same object,
+changes included. Each decoded state gets its own intervention, as the
+states an agent recorded before did, so setting one state's ``eq_mode``
+does not affect the others.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ctoybox import Toybox
+from toybox.interventions import Game, get_intervener
+
+from .lazy import LazyState
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+Path = Tuple[Union[str, int], ...]
+Delta = List[Tuple[Path, Any]]
+
+
+def json_delta(old: Any, new: Any, path: Path = ()) -> Delta:
+    """The (path, value) assignments that turn ``old`` into ``new``."""
+    if isinstance(old, dict) and isinstance(new, dict) and old.keys() == new.keys():
+        delta : Delta = []
+        for k, v in new.items():
+            delta.extend(json_delta(old[k], v, path + (k,)))
+        return delta
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        delta = []
+        for i, (o, n) in enumerate(zip(old, new)):
+            delta.extend(json_delta(o, n, path + (i,)))
+        return delta
+    return [] if old == new else [(path, new)]
+
+
+def apply_delta(js: Any, delta: Delta) -> Any:
+    for path, value in delta:
+        if isinstance(value, (dict, list)):
+            # Copy, so that later deltas never write into the stored one.
+            value = ujson.loads(ujson.dumps(value))
+        if not path:
+            js = value
+            continue
+        target = js
+        for k in path[:-1]:
+            target = target[k]
+        target[path[-1]] = value
+    return js
+
+
+class StateHistory(object):
+
+    def __init__(self, toybox: Toybox, keyframe_interval=64, cache_size=128):
+        self.toybox = toybox
+        self.game_name = toybox.game_name
+        self.keyframe_interval = keyframe_interval
+        self.cache_size = cache_size
+        # One entry per frame: a serialized keyframe (str), a delta (list), or None.
+        self._entries : List[Union[str, Delta, None]] = []
+        self._prev : Optional[Dict[str, Any]] = None
+        self._since_keyframe = 0
+        self._cache : OrderedDict = OrderedDict()
+        # Decoded states evicted from the cache; kept for good.
+        self._kept : Dict[int, LazyState] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i in self._cache:
+            self._cache.move_to_end(i)
+            return self._cache[i]
+        if i in self._kept:
+            return self._kept[i]
+        js = self.get_json(i)
+        state = None if js is None else LazyState(self.game_name, js, self._new_intervention)
+        self._cache[i] = state
+        if len(self._cache) > self.cache_size:
+            j, evicted = self._cache.popitem(last=False)
+            if evicted is not None and evicted.decoded:
+                self._kept[j] = evicted
+        return state
+
+    def _new_intervention(self):
+        return get_intervener(self.game_name)(self.toybox, self.game_name)
+
+    def append(self, state: Union[Game, Dict[str, Any], None]):
+        """Records a frame; ``state`` may be a ``Game``, its JSON, or None."""
+        if state is None:
+            self._entries.append(None)
+            self._prev = None
+            return
+        js = state.encode() if isinstance(state, (Game, LazyState)) else state
+        if self._prev is None or self._since_keyframe >= self.keyframe_interval:
+            self._entries.append(ujson.dumps(js))
+            self._since_keyframe = 0
+        else:
+            self._entries.append(json_delta(self._prev, js))
+        self._since_keyframe += 1
+        self._prev = js
+
+    def extend(self, states):
+        for state in states:
+            self.append(state)
+
+    def get_json(self, i: int) -> Optional[Dict[str, Any]]:
+        """A fresh JSON dict for frame ``i``, rebuilt from the closest keyframe."""
+        if i < 0: i += len(self)
+        entry = self._entries[i]
+        if entry is None:
+            return None
+        start = i
+        while not isinstance(self._entries[start], str):
+            start -= 1
+        js = ujson.loads(self._entries[start])
+        for j in range(start + 1, i + 1):
+            js = apply_delta(js, self._entries[j])
+        return js
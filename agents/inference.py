@@ -0,0 +1,173 @@
+"""Run many agents' model calls as one batch.
+
+Deep agents otherwise load their own copy of a model and run it on one
+observation at a time. An ``InferenceServer`` owns one model: agents call
+``predict`` from any thread, and a worker thread runs whatever has arrived
+-- up to ``max_batch`` observations, waiting at most ``max_wait`` seconds
+after the first -- through the model in one call. ``shared_server`` loads
+each model once per process. Agents only meet in a batch if they step
+concurrently; see ``AgentPool.use_threads``.
+"""
+import queue
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy
+
+
+Request = Tuple[numpy.ndarray, Future]
+# Queued by close() to stop the worker.
+_CLOSE : Any = object()
+
+
+def _rows(out: Any, start: int, stop: int) -> Any:
+    """Rows ``start:stop`` of a model output: an array, or a tuple of arrays (None passes through)."""
+    if isinstance(out, tuple):
+        return tuple(_rows(o, start, stop) for o in out)
+    if out is None:
+        return None
+    return out[start:stop]
+
+
+class InferenceServer(object):
+
+    def __init__(self, predict: Callable[[numpy.ndarray], Any], max_batch=32, max_wait=0.002, batch_size: Optional[int] = None):
+        """``predict`` maps a batch of observations to a batch of outputs.
+
+        Models built for a fixed batch size (such as a baselines act_model,
+        whose batch is the number of environments it was built with) pass it
+        as ``batch_size``: shorter batches are padded with zeros up to it.
+        """
+        self._predict = predict
+        self.batch_size = batch_size
+        self.max_batch = max_batch if batch_size is None else min(max_batch, batch_size)
+        self.max_wait = max_wait
+        # Model calls and the observations they covered.
+        self.calls = 0
+        self.items = 0
+        self._requests : queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, obs) -> Future:
+        """``obs`` is a batch of observations (usually of one), as the model takes it."""
+        obs = numpy.asarray(obs)
+        if len(obs) > self.max_batch:
+            raise ValueError('{} observations exceed max_batch={}'.format(len(obs), self.max_batch))
+        future : Future = Future()
+        self._requests.put((obs, future))
+        return future
+
+    def predict(self, obs) -> Any:
+        return self.submit(obs).result()
+
+    def close(self):
+        if self._thread.is_alive():
+            self._requests.put(_CLOSE)
+            self._thread.join()
+
+    def _gather(self, first: Request) -> Tuple[List[Request], Optional[Request]]:
+        """Collects requests after ``first``; returns the batch and a request that did not fit."""
+        batch, n = [first], len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while n < self.max_batch:
+            try:
+                request = self._requests.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if request is _CLOSE or n + len(request[0]) > self.max_batch:
+                return batch, request
+            batch.append(request)
+            n += len(request[0])
+        return batch, None
+
+    def _serve(self):
+        pending : Optional[Request] = None
+        while True:
+            request = self._requests.get() if pending is None else pending
+            if request is _CLOSE:
+                return
+            batch, pending = self._gather(request)
+            obs = numpy.concatenate([o for o, _ in batch])
+            n = len(obs)
+            if self.batch_size and n < self.batch_size:
+                obs = numpy.concatenate([obs, numpy.zeros((self.batch_size - n,) + obs.shape[1:], dtype=obs.dtype)])
+            try:
+                out = self._predict(obs)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.calls += 1
+            self.items += n
+            start = 0
+            for o, future in batch:
+                future.set_result(_rows(out, start, start + len(o)))
+                start += len(o)
+
+
+_servers : Dict[Hashable, InferenceServer] = {}
+_lock = threading.Lock()
+
+
+def shared_server(key: Hashable, load: Callable[[], InferenceServer]) -> InferenceServer:
+    """The server for ``key``, calling ``load`` only the first time it is asked for."""
+    with _lock:
+        if key not in _servers:
+            _servers[key] = load()
+        return _servers[key]
+
+
+def close_servers():
+    with _lock:
+        for server in _servers.values():
+            server.close()
+        _servers.clear()
+
+
+class _Batched(object):
+    """One vec env presented as ``num_envs`` copies, for loading a model whose batch is ``num_envs``.
+
+    getModel only reads the spaces and ``num_envs`` and resets once; the
+    reset observation is repeated for every copy.
+    """
+
+    def __init__(self, venv, num_envs: int):
+        self.venv = venv
+        self.num_envs = num_envs
+        self.observation_space = venv.observation_space
+        self.action_space = venv.action_space
+
+    def reset(self) -> numpy.ndarray:
+        return numpy.repeat(self.venv.reset(), self.num_envs, axis=0)
+
+    def close(self):
+        self.venv.close()
+
+
+def baselines_server(env_id: str, family: str, seed: int, model_path: str, frame_stack_size=4, max_batch=32, max_wait=0.002) -> InferenceServer:
+    """Loads a baselines model for ``max_batch`` environments and serves its ``step``.
+
+    The act_model's batch is fixed to the number of environments it is built
+    for, so the model is loaded against one environment posing as
+    ``max_batch`` (see _Batched), which is closed once the model is built,
+    and short batches are padded.
+    """
+    from toybox.testing.models.openai_baselines import getModel
+    from agents.envs import make_vec_env, RingFrameStack
+
+    env = _Batched(RingFrameStack(make_vec_env(env_id, 1, seed), frame_stack_size), max_batch)
+    try:
+        model = getModel(env, family, seed, model_path)
+    finally:
+        env.close()
+    return InferenceServer(model.step, max_batch=max_batch, max_wait=max_wait, batch_size=max_batch)
@@ -0,0 +1,239 @@
+"""Opt-in per-phase timing of ``Agent.step``.
+
+A ``StepProfiler`` attached to an agent wraps the hot calls of a rollout --
+``get_action``, intervention enter/exit, ``apply_action``, ``write_data`` and
+the Toybox JSON round trips -- and keeps a call count, total time and a
+power-of-two histogram for each. Phases nest: ``step`` contains everything,
+``get_action`` contains the intervention phases, and both the intervention
+and ``write_data`` contain ``state_to_json``.
+
+    profiler = agent.use_profiler()
+    agent.play(path, maxsteps)       # prints the summary when play ends
+
+Profiling patches the agent, its Toybox and the game's intervention class;
+``detach`` (or leaving ``with profiler:``) undoes all of it. ``Agent.end_play``
+detaches after reporting, and ``begin_play`` attaches again, so the
+intervention class is only patched while a profiled agent is playing.
+"""
+import sys
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from toybox.interventions import get_intervener
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+# Not .json, so that loaders globbing a run's state files skip it.
+EXTENSION = '.profile'
+
+PHASES = ('step', 'get_action', 'intervention_enter', 'intervention_exit', 'apply_action',
+          'write_data', 'state_to_json', 'write_state_json')
+
+# Bucket i counts calls that took less than 2**i nanoseconds.
+NUM_BUCKETS = 40
+
+_clock = time.perf_counter_ns
+
+
+class PhaseStats(object):
+
+    __slots__ = ('count', 'total', 'max', 'bytes', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.bytes = 0
+        self.buckets = [0] * NUM_BUCKETS
+
+    def add(self, elapsed: int):
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max: self.max = elapsed
+        self.buckets[min(elapsed.bit_length(), NUM_BUCKETS - 1)] += 1
+
+    def percentile(self, q: float) -> int:
+        """An upper bound, in nanoseconds, on the q-th percentile call."""
+        seen, target = 0, q * self.count
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(1 << i, self.max)
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'count': self.count, 'total_ns': self.total, 'max_ns': self.max,
+                'bytes': self.bytes, 'buckets': self.buckets}
+
+
+# Patched intervention classes -> [their own __enter__/__exit__ (None if inherited), attached profilers].
+_instrumented : Dict[type, List[Any]] = {}
+
+
+def _instrument_intervention(cls):
+    """Routes enter/exit of an intervention class to the profiler of its toybox, if any.
+
+    Each call must be matched by a _restore_intervention; the class is
+    restored when the last profiler using it detaches.
+    """
+    if cls in _instrumented:
+        _instrumented[cls][1] += 1
+        return
+    originals = {name: cls.__dict__.get(name) for name in ('__enter__', '__exit__')}
+    enter, exit = cls.__enter__, cls.__exit__
+
+    def __enter__(self):
+        profiler = getattr(getattr(self, 'toybox', None), '_profiler', None)
+        if profiler is None:
+            return enter(self)
+        start = _clock()
+        try:
+            return enter(self)
+        finally:
+            profiler.phases['intervention_enter'].add(_clock() - start)
+
+    def __exit__(self, *args):
+        profiler = getattr(getattr(self, 'toybox', None), '_profiler', None)
+        if profiler is None:
+            return exit(self, *args)
+        start = _clock()
+        try:
+            return exit(self, *args)
+        finally:
+            profiler.phases['intervention_exit'].add(_clock() - start)
+
+    cls.__enter__, cls.__exit__ = __enter__, __exit__
+    _instrumented[cls] = [originals, 1]
+
+
+def _restore_intervention(cls):
+    entry = _instrumented.get(cls)
+    if entry is None:
+        return
+    entry[1] -= 1
+    if entry[1]:
+        return
+    for name, original in entry[0].items():
+        if original is None:
+            delattr(cls, name)
+        else:
+            setattr(cls, name, original)
+    del _instrumented[cls]
+
+
+class StepProfiler(object):
+    """Counters and histograms for one agent.
+
+    With ``count_bytes`` set, the JSON moved through ``state_to_json`` and
+    ``write_state_json`` is serialized once more to measure it; that time is
+    not charged to either phase.
+    """
+
+    def __init__(self, name='', count_bytes=True):
+        self.name = name
+        self.count_bytes = count_bytes
+        self.phases = OrderedDict((phase, PhaseStats()) for phase in PHASES)
+        self._patched = []
+        self._toybox = None
+        self._intervention = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.detach()
+
+    @property
+    def attached(self) -> bool:
+        return self._toybox is not None
+
+    def _timed(self, phase: str, fn: Callable) -> Callable:
+        stats = self.phases[phase]
+        def timed(*args, **kwargs):
+            start = _clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats.add(_clock() - start)
+        return timed
+
+    def _patch(self, obj, attr: str, wrapper: Callable):
+        self._patched.append((obj, attr, attr in obj.__dict__, obj.__dict__.get(attr)))
+        setattr(obj, attr, wrapper)
+
+    def attach(self, agent) -> 'StepProfiler':
+        """Starts timing ``agent``'s steps; counters carry on from any earlier attachment."""
+        if self.attached:
+            return self
+        self.name = self.name or agent.name
+        tb = agent.toybox
+        for attr, phase in [('step', 'step'), ('get_action', 'get_action'), ('write_data', 'write_data')]:
+            self._patch(agent, attr, self._timed(phase, getattr(agent, attr)))
+        for attr in ['apply_action', 'apply_ale_action']:
+            self._patch(tb, attr, self._timed('apply_action', getattr(tb, attr)))
+
+        state_to_json, write_state_json = tb.state_to_json, tb.write_state_json
+        to_json, from_json = self.phases['state_to_json'], self.phases['write_state_json']
+
+        def profiled_state_to_json():
+            start = _clock()
+            js = state_to_json()
+            to_json.add(_clock() - start)
+            if self.count_bytes: to_json.bytes += len(ujson.dumps(js))
+            return js
+
+        def profiled_write_state_json(js):
+            start = _clock()
+            write_state_json(js)
+            from_json.add(_clock() - start)
+            if self.count_bytes: from_json.bytes += len(js if isinstance(js, str) else ujson.dumps(js))
+
+        self._patch(tb, 'state_to_json', profiled_state_to_json)
+        self._patch(tb, 'write_state_json', profiled_write_state_json)
+
+        self._intervention = get_intervener(tb.game_name)
+        _instrument_intervention(self._intervention)
+        tb._profiler = self
+        self._toybox = tb
+        return self
+
+    def detach(self):
+        for obj, attr, had_attr, value in reversed(self._patched):
+            if had_attr:
+                setattr(obj, attr, value)
+            else:
+                delattr(obj, attr)
+        if getattr(self._toybox, '_profiler', None) is self:
+            del self._toybox._profiler
+        if self._intervention is not None:
+            _restore_intervention(self._intervention)
+        self._patched = []
+        self._toybox = None
+        self._intervention = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'name': self.name, 'phases': {p: s.as_dict() for p, s in self.phases.items()}}
+
+    def summary(self) -> str:
+        lines = ['Profile for {}'.format(self.name),
+                 '{:<20}{:>10}{:>12}{:>10}{:>10}{:>10}{:>12}'.format('phase', 'calls', 'total (s)', 'mean', 'p50', 'p99', 'MB')]
+        us = lambda ns: '{:.0f}us'.format(ns / 1e3)
+        for phase, stats in self.phases.items():
+            if not stats.count: continue
+            lines.append('{:<20}{:>10}{:>12.3f}{:>10}{:>10}{:>10}{:>12}'.format(
+                phase, stats.count, stats.total / 1e9, us(stats.total / stats.count),
+                us(stats.percentile(0.5)), us(stats.percentile(0.99)),
+                '{:.1f}'.format(stats.bytes / 1e6) if stats.bytes else '-'))
+        return '\n'.join(lines)
+
+    def report(self, filename: Optional[str] = None, file=sys.stderr):
+        """Prints the summary; with ``filename``, also writes the raw counters as JSON."""
+        print(self.summary(), file=file)
+        if filename:
+            with open(filename, 'w') as f:
+                ujson.dump(self.as_dict(), f)
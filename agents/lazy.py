@@ -0,0 +1,169 @@
+"""Game states that stay in their JSON form until something needs a ``Game``.
+
+Most consumers of recorded states -- outcome predicates, composite variable
+getters, CSV feature extraction -- only read a handful of fields. A
+``LazyState`` answers those reads from the JSON directly and only runs
+``Game.decode`` when code asks for something the JSON does not have (the
+intervention, ``sample``), or assigns to the state. Two undecoded states
+compare by their JSON.
+"""
+from typing import Any, Callable, Dict, Optional, Union
+
+from toybox.interventions import Game, get_state_object
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+
+def _view(value: Any) -> Any:
+    if isinstance(value, dict):
+        return JsonView(value)
+    if isinstance(value, list):
+        return JsonList(value)
+    return value
+
+
+class JsonView(object):
+    """Read-only attribute access to a JSON object."""
+
+    __slots__ = ('_js',)
+
+    def __init__(self, js: Dict[str, Any]):
+        object.__setattr__(self, '_js', js)
+
+    def __getattr__(self, name):
+        try:
+            return _view(self._js[name])
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('JSON views are read-only; assign through LazyState.game')
+
+    def __eq__(self, other):
+        if not isinstance(other, JsonView):
+            return NotImplemented
+        return self._js == other._js
+
+    def __ne__(self, other):
+        if not isinstance(other, JsonView):
+            return NotImplemented
+        return self._js != other._js
+
+    # Unhashable, like the dict it views.
+    __hash__ = None
+
+    def __repr__(self):
+        return 'JsonView({})'.format(self._js)
+
+
+class JsonList(object):
+    """Read-only sequence access to a JSON array."""
+
+    __slots__ = ('_js',)
+
+    def __init__(self, js: list):
+        self._js = js
+
+    def __len__(self):
+        return len(self._js)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [_view(v) for v in self._js[i]]
+        return _view(self._js[i])
+
+    def __iter__(self):
+        for v in self._js:
+            yield _view(v)
+
+    def __eq__(self, other):
+        if not isinstance(other, JsonList):
+            return NotImplemented
+        return self._js == other._js
+
+    def __ne__(self, other):
+        if not isinstance(other, JsonList):
+            return NotImplemented
+        return self._js != other._js
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'JsonList({})'.format(self._js)
+
+
+class LazyState(object):
+    """A proxy for a ``Game`` backed by its raw JSON (str, bytes, or dict).
+
+    ``intervention`` is either an intervention object or a zero-argument
+    function returning one; it is only used once the state is decoded.
+    """
+
+    __slots__ = ('game_name', '_raw', '_js', '_game', '_intervention')
+
+    def __init__(self, game_name: str, raw: Union[str, bytes, Dict[str, Any]], intervention: Any = None):
+        object.__setattr__(self, 'game_name', game_name)
+        object.__setattr__(self, '_raw', raw)
+        object.__setattr__(self, '_js', raw if isinstance(raw, dict) else None)
+        object.__setattr__(self, '_game', None)
+        object.__setattr__(self, '_intervention', intervention)
+
+    def json(self) -> Dict[str, Any]:
+        if self._js is None:
+            object.__setattr__(self, '_js', ujson.loads(self._raw))
+        return self._js
+
+    @property
+    def decoded(self) -> bool:
+        return self._game is not None
+
+    @property
+    def game(self) -> Game:
+        if self._game is None:
+            intervention = self._intervention() if callable(self._intervention) else self._intervention
+            game = get_state_object(self.game_name)
+            object.__setattr__(self, '_game', game.decode(intervention, self.json(), game))
+        return self._game
+
+    def raw(self) -> Union[str, bytes]:
+        """The original serialized state if it has not been decoded, else a fresh serialization."""
+        if self._game is None and not isinstance(self._raw, dict):
+            return self._raw
+        return ujson.dumps(self.encode())
+
+    def encode(self) -> Dict[str, Any]:
+        if self._game is not None:
+            return self._game.encode()
+        return self.json()
+
+    def __getattr__(self, name):
+        if self._game is not None:
+            return getattr(self._game, name)
+        js = self.json()
+        if name in js:
+            return _view(js[name])
+        return getattr(self.game, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.game, name, value)
+
+    def __eq__(self, other):
+        if isinstance(other, LazyState) and self._game is None and other._game is None:
+            # Neither has been decoded (or changed, or given an eq_mode): the JSON is the state.
+            return self.json() == other.json()
+        return self.game == materialize(other)
+
+    def __ne__(self, other):
+        if isinstance(other, LazyState) and self._game is None and other._game is None:
+            return self.json() != other.json()
+        return self.game != materialize(other)
+
+    def __hash__(self):
+        return id(self)
+
+
+def materialize(state: Union[Game, LazyState, None]) -> Optional[Game]:
+    return state.game if isinstance(state, LazyState) else state
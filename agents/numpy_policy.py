@@ -0,0 +1,254 @@
+"""Run the saved PPO2 / A2C / DQN Atari policies with NumPy alone.
+
+All of the deep agents' models are the Nature CNN (three convolutions and a
+512-unit layer) with a policy head and a value head (or a Q head). Loading
+TensorFlow and baselines, or torch and stable_baselines3, just to run that
+network dominates startup and memory, so ``export`` converts a checkpoint
+once into a ``.npz`` of plain arrays and ``NumpyPolicy`` runs the forward
+pass on the CPU.
+
+The arrays use one layout whichever library trained the model: observations
+are NHWC uint8 frame stacks (as the gym envs produce them), convolution
+kernels are HWIO and dense weights are (in, out). Torch flattens its last
+feature map channels-first, so its first dense layer is permuted to match.
+
+    python -m agents.numpy_policy export --library baselines --family ppo2 \\
+        --model-path agents/data/BreakoutToyboxNoFrameskip-v4.regress.model --env-id BreakoutToyboxNoFrameskip-v4
+    python -m agents.numpy_policy verify --library baselines --family ppo2 \\
+        --model-path agents/data/BreakoutToyboxNoFrameskip-v4.regress.model --env-id BreakoutToyboxNoFrameskip-v4
+"""
+from typing import Any, Dict, Optional, Tuple
+
+import numpy
+
+from numpy.lib.stride_tricks import as_strided
+
+
+EXTENSION = '.npz'
+
+# (name, stride) of the Nature CNN's convolutions, in order.
+CONVS = [('c1', 4), ('c2', 2), ('c3', 1)]
+
+
+def weights_file(model_path: str) -> str:
+    """Where ``export`` puts the weights for ``model_path`` by default."""
+    return model_path + EXTENSION
+
+
+def _conv(x: numpy.ndarray, w: numpy.ndarray, b: numpy.ndarray, stride: int) -> numpy.ndarray:
+    """VALID convolution of NHWC ``x`` with HWIO ``w``."""
+    n, h, width, c = x.shape
+    kh, kw = w.shape[:2]
+    oh, ow = (h - kh) // stride + 1, (width - kw) // stride + 1
+    s = x.strides
+    patches = as_strided(x, shape=(n, oh, ow, kh, kw, c),
+                         strides=(s[0], s[1] * stride, s[2] * stride, s[1], s[2], s[3]), writeable=False)
+    return numpy.tensordot(patches, w, axes=3) + b
+
+
+def _relu(x: numpy.ndarray) -> numpy.ndarray:
+    return numpy.maximum(x, 0, out=x)
+
+
+def _softmax(logits: numpy.ndarray) -> numpy.ndarray:
+    e = numpy.exp(logits - logits.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def _batch(obs) -> Tuple[numpy.ndarray, bool]:
+    """``obs`` as an NHWC batch, and whether it was a single HWC observation."""
+    obs = numpy.asarray(obs)
+    if obs.ndim == 3:
+        return obs[None], True
+    return obs, False
+
+
+def _unbatch(out: numpy.ndarray, single: bool) -> Any:
+    return out[0] if single else out
+
+
+class NumpyPolicy(object):
+    """The forward pass of an exported model.
+
+    ``step`` answers like a baselines model and ``predict`` like a
+    stable_baselines3 one, so agents can use either in place of the original.
+    """
+
+    def __init__(self, weights: Dict[str, numpy.ndarray], seed: Optional[int] = None):
+        self.weights = {k: v.astype(numpy.float32) for k, v in weights.items()}
+        # Q networks (DQN) have a 'q' head; actor-critics have 'pi' and 'vf'.
+        self.head = 'q' if 'q/w' in self.weights else 'pi'
+        self.rng = numpy.random.RandomState(seed)
+
+    @staticmethod
+    def load(path: str, seed: Optional[int] = None) -> 'NumpyPolicy':
+        with numpy.load(path) as f:
+            return NumpyPolicy({k: f[k] for k in f.files}, seed)
+
+    def save(self, path: str):
+        # numpy.savez would append .npz to a path without it.
+        with open(path, 'wb') as f:
+            numpy.savez(f, **self.weights)
+
+    @property
+    def num_actions(self) -> int:
+        return self.weights[self.head + '/b'].shape[0]
+
+    def latent(self, obs) -> numpy.ndarray:
+        """The 512 features of each NHWC observation in the batch."""
+        x = numpy.asarray(obs, dtype=numpy.float32) / 255.
+        for name, stride in CONVS:
+            x = _relu(_conv(x, self.weights[name + '/w'], self.weights[name + '/b'], stride))
+        x = x.reshape(len(x), -1)
+        return _relu(x @ self.weights['fc1/w'] + self.weights['fc1/b'])
+
+    def _dense(self, latent: numpy.ndarray, name: str) -> numpy.ndarray:
+        return latent @ self.weights[name + '/w'] + self.weights[name + '/b']
+
+    def logits(self, obs) -> numpy.ndarray:
+        """Action logits (Q values for a Q network)."""
+        return self._dense(self.latent(obs), self.head)
+
+    def probabilities(self, obs) -> numpy.ndarray:
+        return _softmax(self.logits(obs))
+
+    def value(self, obs) -> numpy.ndarray:
+        return self._dense(self.latent(obs), 'vf')[:, 0]
+
+    def _sample(self, logits: numpy.ndarray) -> numpy.ndarray:
+        # Gumbel-max, as baselines' CategoricalPd.sample.
+        u = self.rng.uniform(size=logits.shape)
+        return numpy.argmax(logits - numpy.log(-numpy.log(u)), axis=-1)
+
+    def step(self, obs, **kwargs) -> Tuple[Any, Any, None, Any]:
+        """As a baselines model's ``step``: (actions, values, states, neglogps).
+
+        A single (H, W, C) observation gets unbatched results, as sb3 models do.
+        """
+        obs, single = _batch(obs)
+        latent = self.latent(obs)
+        logits = self._dense(latent, self.head)
+        if self.head == 'q':
+            return _unbatch(numpy.argmax(logits, axis=-1), single), None, None, None
+        actions = self._sample(logits)
+        logp = numpy.log(_softmax(logits)[numpy.arange(len(actions)), actions])
+        return _unbatch(actions, single), _unbatch(self._dense(latent, 'vf')[:, 0], single), None, _unbatch(-logp, single)
+
+    def predict(self, obs, state=None, deterministic=False, **kwargs) -> Tuple[Any, Any]:
+        """As a stable_baselines3 model's ``predict``: (actions, state), or (action, state) for one observation."""
+        obs, single = _batch(obs)
+        logits = self.logits(obs)
+        if deterministic or self.head == 'q':
+            return _unbatch(numpy.argmax(logits, axis=-1), single), state
+        return _unbatch(self._sample(logits), single), state
+
+
+def baselines_weights(model) -> Dict[str, numpy.ndarray]:
+    """Arrays of a loaded baselines model, from its variables (e.g. ppo2_model/pi/c1/w:0)."""
+    import tensorflow as tf
+    variables = {}
+    for v in tf.trainable_variables():
+        # The last two name components identify the layer: c1/w, fc1/b, pi/w, vf/b.
+        key = '/'.join(v.name.split(':')[0].split('/')[-2:])
+        variables.setdefault(key, v)
+    weights = dict(zip(variables, model.sess.run(list(variables.values()))))
+    # Convolution biases are stored as [1, 1, 1, nf].
+    return {k: v.reshape(-1) if k.endswith('/b') else v for k, v in weights.items()}
+
+
+def torch_weights(model) -> Dict[str, numpy.ndarray]:
+    """Arrays of a loaded stable_baselines3 CNN policy (A2C, PPO or DQN)."""
+    state = {k: v.detach().cpu().numpy() for k, v in model.policy.state_dict().items()}
+
+    def find(suffix):
+        # Actor-critics may hold a copy for the critic (vf_features_extractor); the first suffix match is the actor's.
+        return next(v for k, v in state.items() if k.endswith(suffix))
+
+    weights = {}
+    for i, (name, _) in enumerate(CONVS):
+        weights[name + '/w'] = find('features_extractor.cnn.{}.weight'.format(2 * i)).transpose(2, 3, 1, 0)
+        weights[name + '/b'] = find('features_extractor.cnn.{}.bias'.format(2 * i))
+
+    # Reorder the first dense layer's inputs from (C, H, W) to (H, W, C).
+    fc1 = find('features_extractor.linear.0.weight')
+    channels = weights['c3/w'].shape[3]
+    side = int(round((fc1.shape[1] // channels) ** 0.5))
+    weights['fc1/w'] = fc1.reshape(-1, channels, side, side).transpose(0, 2, 3, 1).reshape(fc1.shape[0], -1).T
+    weights['fc1/b'] = find('features_extractor.linear.0.bias')
+
+    if any(k.endswith('action_net.weight') for k in state):
+        weights['pi/w'], weights['pi/b'] = find('action_net.weight').T, find('action_net.bias')
+        weights['vf/w'], weights['vf/b'] = find('value_net.weight').T, find('value_net.bias')
+    else:
+        weights['q/w'], weights['q/b'] = find('q_net.q_net.0.weight').T, find('q_net.q_net.0.bias')
+    return weights
+
+
+def load_original(library: str, family: str, model_path: str, env_id: Optional[str] = None, seed=1234):
+    """Loads a model with the library that trained it."""
+    if library == 'baselines':
+        from toybox.testing.models.openai_baselines import getModel
+        from agents.envs import make_vec_env, RingFrameStack
+        env = RingFrameStack(make_vec_env(env_id, 1, seed), 4)
+        return getModel(env, family, seed, model_path)
+    from agents.amidar.stablebaselines import StableBaselines
+    return StableBaselines.getModel(family, seed, model_path)
+
+
+def export(library: str, family: str, model_path: str, env_id: Optional[str] = None, output: Optional[str] = None) -> str:
+    model = load_original(library, family, model_path, env_id)
+    weights = baselines_weights(model) if library == 'baselines' else torch_weights(model)
+    output = output or weights_file(model_path)
+    NumpyPolicy(weights).save(output)
+    return output
+
+
+def original_outputs(library: str, model, obs: numpy.ndarray) -> numpy.ndarray:
+    """Action probabilities (Q values for DQN) of the original model."""
+    if library == 'baselines':
+        # The act_model's batch is the one environment it was loaded with.
+        act = model.act_model
+        return numpy.concatenate([_softmax(model.sess.run(act.pi, {act.X: obs[i:i+1]})) for i in range(len(obs))])
+    import torch
+    with torch.no_grad():
+        tensor, _ = model.policy.obs_to_tensor(obs)
+        if hasattr(model.policy, 'q_net'):
+            return model.policy.q_net(tensor).cpu().numpy()
+        return model.policy.get_distribution(tensor).distribution.probs.cpu().numpy()
+
+
+def verify(library: str, family: str, model_path: str, env_id: Optional[str] = None, weights: Optional[str] = None,
+           samples=256, seed=0, atol=1e-4) -> float:
+    """Compares the exported and original models on random frame stacks; returns the largest difference."""
+    model = load_original(library, family, model_path, env_id)
+    policy = NumpyPolicy.load(weights or weights_file(model_path))
+    rng = numpy.random.RandomState(seed)
+    channels = policy.weights['c1/w'].shape[2]
+    obs = rng.randint(0, 256, size=(samples, 84, 84, channels)).astype(numpy.uint8)
+    obs[0] = 0
+    mine = policy.logits(obs) if policy.head == 'q' else policy.probabilities(obs)
+    theirs = original_outputs(library, model, obs)
+    diff = float(numpy.abs(mine - theirs).max())
+    if diff > atol:
+        raise AssertionError('NumPy policy differs from the original by {} (atol={})'.format(diff, atol))
+    return diff
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Export a saved Atari policy to NumPy arrays, or check an export against the original.')
+    parser.add_argument('command',      choices=['export', 'verify'])
+    parser.add_argument('--library',    required=True, choices=['baselines', 'stable_baselines3'])
+    parser.add_argument('--family',     required=True, help='ppo2 or a2c for baselines; A2C, PPO or DQN for stable_baselines3.')
+    parser.add_argument('--model-path', required=True)
+    parser.add_argument('--env-id',     help='Needed to load baselines models, e.g. BreakoutToyboxNoFrameskip-v4.')
+    parser.add_argument('--weights',    help='The .npz file (default: <model-path>.npz).')
+    parser.add_argument('--samples',    default=256, type=int)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print('Wrote', export(args.library, args.family, args.model_path, args.env_id, args.weights))
+    else:
+        diff = verify(args.library, args.family, args.model_path, args.env_id, args.weights, args.samples)
+        print('OK: largest difference {:.2e}'.format(diff))
@@ -0,0 +1,146 @@
+"""Run many agent/Toybox pairs in lockstep inside a single process."""
+import importlib
+import os
+import signal
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from ctoybox import Toybox
+import toybox
+
+from .base import Agent, INPUTS, BUTTON1
+
+
+def new_game(game: str, seed: Optional[int] = None, tb: Optional[Toybox] = None) -> Toybox:
+    """A fresh game the way ``python -m agents`` plays it: seeded, with only one life."""
+    game_lower = game.lower()
+    importlib.import_module('toybox.interventions.' + game_lower)
+
+    tb = tb or Toybox(game_lower)
+    # First reset the random seed
+    if seed:
+        tb.set_seed(seed)
+        tb.new_game()
+
+    # Run with only one life
+    intervener = toybox.interventions.get_intervener(game_lower)
+    with intervener(tb) as intervention:
+        intervention.game.lives = 0
+
+    if game_lower == 'breakout':
+        # Need to get the ball (i.e., start the game)
+        tb.apply_action(INPUTS[BUTTON1])
+    return tb
+
+
+def make_agent(game: str, agentclass: str, seed: Optional[int] = None, tb: Optional[Toybox] = None, **kwargs) -> Agent:
+    """Builds an agent the way ``python -m agents`` does: a fresh game with only one life.
+
+    The Toybox is seeded once, by ``new_game``, before the game starts.
+    """
+    module = importlib.import_module('agents.' + game.lower() + '.' + agentclass.lower())
+    tb = new_game(game, seed, tb)
+    if seed:
+        kwargs['seed'] = seed
+        kwargs['seed_toybox'] = False
+    return getattr(module, agentclass)(tb, **kwargs)
+
+
+class AgentPool(object):
+    """Steps N agents, each with its own Toybox, seed, action log and output directory.
+
+    Every call to ``step`` advances each agent that has not yet hit its
+    stopping condition by one action. Each agent draws from its own
+    ``rng``, so a pooled run makes the same choices as a solo run.
+    """
+
+    def __init__(self, agents: Sequence[Agent], paths: Optional[Sequence[Optional[str]]] = None, owns_toyboxes=False):
+        """``owns_toyboxes``: close the agents' Toyboxes on ``close``; set when the pool built them."""
+        self.agents = list(agents)
+        self.paths = list(paths) if paths else [None] * len(self.agents)
+        assert len(self.paths) == len(self.agents)
+        self.owns_toyboxes = owns_toyboxes
+        self.active = [False] * len(self.agents)
+        # When set, agents step concurrently (see use_threads).
+        self.executor : Optional[ThreadPoolExecutor] = None
+
+    @staticmethod
+    def from_seeds(game: str, agentclasses: Sequence[str], seeds: Sequence[int], output: Optional[str] = None, **kwargs) -> 'AgentPool':
+        """One agent per (class, seed); output goes to ``output/<class>/<seed>``.
+
+        Remaining keyword arguments go to each agent's constructor (e.g.,
+        ``shared_model=True`` for deep agents).
+        """
+        agents, paths = [], []
+        for agentclass in agentclasses:
+            for seed in seeds:
+                agents.append(make_agent(game, agentclass, seed, **kwargs))
+                paths.append(os.sep.join([output, agentclass, str(seed)]) if output else None)
+        return AgentPool(agents, paths, owns_toyboxes=True)
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def use_threads(self, workers: Optional[int] = None):
+        """Steps the agents on a thread pool, so that deep agents built with
+        ``shared_model=True`` send their observations to the model together
+        (see agents.inference)."""
+        self.executor = ThreadPoolExecutor(max_workers=workers or len(self.agents))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        for agent in self.agents:
+            agent.close_writer()
+            if self.owns_toyboxes:
+                agent.toybox.__exit__(None, None, None)
+
+    def kill_and_record(self):
+        def inner(sig, frame):
+            for agent, path in zip(self.agents, self.paths):
+                if agent.writer is not None: agent.writer.flush()
+                if path: agent.save_actions(path)
+                agent.close_trajectory()
+                agent.stop_profiler(path)
+            exit(0)
+        return inner
+
+    def step(self, maxsteps, write_json_to_file=True, save_states=False) -> List[bool]:
+        """Advances every active agent by one step; returns which agents are still active."""
+        def step_one(i):
+            agent = self.agents[i]
+            agent.step(self.paths[i], write_json_to_file, save_states)
+            self.active[i] = not agent.stopping_condition(maxsteps)
+
+        live = [i for i, active in enumerate(self.active) if active]
+        if self.executor is not None:
+            # list() waits for every agent and re-raises the first error.
+            list(self.executor.map(step_one, live))
+        else:
+            for i in live:
+                step_one(i)
+        return self.active
+
+    def play(self, maxsteps=2000, write_json_to_file=True, save_states=False, startstates=None):
+        signal.signal(signal.SIGINT, self.kill_and_record())
+        signal.signal(signal.SIGTERM, self.kill_and_record())
+
+        maxsteps = abs(maxsteps)
+        startstates = startstates or [None] * len(self.agents)
+        for i, (agent, path) in enumerate(zip(self.agents, self.paths)):
+            agent.begin_play(path, write_json_to_file, save_states, startstates[i])
+            self.active[i] = not agent.stopping_condition(maxsteps)
+
+        while any(self.active):
+            self.step(maxsteps, write_json_to_file, save_states)
+
+        for agent, path in zip(self.agents, self.paths):
+            agent.end_play(path, maxsteps, save_states)
@@ -0,0 +1,137 @@
+"""Rebuild a run's states from its actions and a few keyframes.
+
+Toybox is deterministic given a state and an action, so a run does not need
+every state on disk: the ``replay`` output format stores the actions (as
+action codes) plus a keyframe every ``keyframe_interval`` frames, in the
+same container as a ``.traj`` file. ``Replay`` regenerates any state by
+loading the nearest earlier keyframe and re-applying at most
+``keyframe_interval - 1`` steps; iterating in order costs one step per state.
+"""
+import os
+
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ctoybox import Toybox
+
+from .base import apply_action_code, action_code, ACTION_STRINGS
+from .trajectory import TrajectoryReader, replay_file, REPLAY_EXTENSION as EXTENSION
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+
+def find_replay(path: str) -> Optional[str]:
+    """Returns the replay file in directory ``path``, if there is one."""
+    for f in sorted(os.listdir(path)):
+        if f.endswith(EXTENSION):
+            return path + os.sep + f
+    return None
+
+
+class Replay(object):
+    """The states of a recorded run, indexed from 0 (the start state).
+
+    State ``k`` is the state after the first ``k`` actions, which the
+    ``files`` format would have written with frame id
+    ``(k + 1) * action_repeat``.
+    """
+
+    def __init__(self, source: Union[str, bytes, TrajectoryReader], toybox: Optional[Toybox] = None):
+        self.reader = source if isinstance(source, TrajectoryReader) else TrajectoryReader(source)
+        meta = self.reader.meta
+        self.game: str = meta['game']
+        self.agent: str = meta.get('agent', '')
+        self.seed: Optional[int] = meta.get('seed')
+        self.action_repeat: int = meta.get('action_repeat', 1)
+        self.keyframe_interval: int = meta['keyframe_interval']
+        self.codes: List[int] = self.reader.index.get('action_codes') or [action_code(a) for a in self.reader.actions]
+        self._count: int = meta.get('last_frame', len(self.codes) * self.action_repeat) // self.action_repeat
+        self._toybox = toybox
+        self._owns_toybox = toybox is None
+        self._position: Optional[int] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if self._owns_toybox and self._toybox is not None:
+            self._toybox.__exit__(None, None, None)
+        self._toybox = None
+        self.reader.close()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def toybox(self) -> Toybox:
+        if self._toybox is None:
+            self._toybox = Toybox(self.game)
+            if self.seed: self._toybox.set_seed(self.seed)
+        return self._toybox
+
+    @property
+    def actions(self) -> List[str]:
+        return [ACTION_STRINGS[c] for c in self.codes]
+
+    def frame_id(self, k: int) -> int:
+        return (k + 1) * self.action_repeat
+
+    def filename(self, k: int) -> str:
+        """The name state ``k`` would have had as a per-frame json file."""
+        return self.agent + str(self.frame_id(k)).zfill(5) + '.json'
+
+    def keyframe(self, k: int) -> Dict[str, Any]:
+        """The stored keyframe at or before state ``k``."""
+        return self.reader[k // self.keyframe_interval]
+
+    def _load(self, k: int):
+        self.toybox.write_state_json(self.keyframe(k))
+        self._position = k - k % self.keyframe_interval
+
+    def _advance(self, k: int):
+        tb = self.toybox
+        for code in self.codes[self._position:k]:
+            for _ in range(self.action_repeat):
+                apply_action_code(tb, code)
+        self._position = k
+
+    def _seek(self, k: int):
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        # Keep stepping from the current position when that is no further than the keyframe.
+        if self._position is None or not k - k % self.keyframe_interval <= self._position <= k:
+            self._load(k)
+        self._advance(k)
+
+    def state(self, k: int) -> Dict[str, Any]:
+        if k < 0: k += len(self)
+        self._seek(k)
+        return self.toybox.state_to_json()
+
+    __getitem__ = state
+
+    def raw(self, k: int) -> str:
+        return ujson.dumps(self.state(k))
+
+    def frame(self, frame_id: int) -> Dict[str, Any]:
+        """Returns the state for frame number ``frame_id``."""
+        return self.state(frame_id // self.action_repeat - 1)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for k in range(len(self)):
+            yield self.state(k)
+
+    def verify(self) -> List[int]:
+        """Replays the whole run; returns the states whose stored keyframe differs from the replayed one."""
+        mismatched = []
+        self._load(0)
+        for k in range(self.keyframe_interval, len(self), self.keyframe_interval):
+            self._advance(k)
+            if self.toybox.state_to_json() != self.keyframe(k):
+                mismatched.append(k)
+        return mismatched
@@ -0,0 +1,224 @@
+"""Single-file, chunked and compressed storage for a run's states and actions.
+
+Layout of a ``.traj`` file::
+
+    MAGIC
+    chunk*    -- header (compressed length, record count), then a zlib blob
+                 of length-prefixed state JSON records
+    footer    -- zlib-compressed JSON index (metadata, frame ids, chunk offsets, actions)
+    trailer   -- footer offset, footer length, MAGIC
+
+Every chunk except the last holds exactly ``chunk_size`` records, so random
+access to record ``i`` decompresses a single chunk. When a run is killed
+before the footer is written, the reader rebuilds the index by walking the
+chunk headers.
+"""
+import io
+import os
+import struct
+import zlib
+
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+MAGIC = b'TBXTRJ01'
+EXTENSION = '.traj'
+# Same container, holding only keyframes; see agents.replay.
+REPLAY_EXTENSION = '.replay'
+
+_CHUNK_HEADER = struct.Struct('<II')
+_RECORD_HEADER = struct.Struct('<I')
+_TRAILER = struct.Struct('<QI8s')
+
+
+def trajectory_file(path: str, name: str) -> str:
+    return path + os.sep + name + EXTENSION
+
+
+def replay_file(path: str, name: str) -> str:
+    return path + os.sep + name + REPLAY_EXTENSION
+
+
+def find_trajectory(path: str) -> Optional[str]:
+    """Returns the trajectory file in directory ``path``, if there is one."""
+    for f in sorted(os.listdir(path)):
+        if f.endswith(EXTENSION):
+            return path + os.sep + f
+    return None
+
+
+class TrajectoryWriter(object):
+
+    def __init__(self, filename: str, chunk_size=64, level=6, **meta):
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.level = level
+        self.meta = meta
+        self.frames: List[int] = []
+        self.chunks: List[List[int]] = []
+        self._buffer: List[bytes] = []
+        self._f = open(filename, 'wb')
+        self._f.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.frames)
+
+    @property
+    def closed(self):
+        return self._f is None
+
+    def append(self, frame_id: int, state: Union[str, bytes, Dict[str, Any]]):
+        if isinstance(state, dict):
+            state = ujson.dumps(state)
+        if isinstance(state, str):
+            state = state.encode('utf-8')
+        self.frames.append(frame_id)
+        self._buffer.append(_RECORD_HEADER.pack(len(state)) + state)
+        if len(self._buffer) >= self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        if not self._buffer: return
+        blob = zlib.compress(b''.join(self._buffer), self.level)
+        offset = self._f.tell()
+        self._f.write(_CHUNK_HEADER.pack(len(blob), len(self._buffer)))
+        self._f.write(blob)
+        self.chunks.append([offset, len(blob), len(self._buffer)])
+        self._buffer = []
+
+    def close(self, actions: Optional[List[str]] = None, **meta):
+        if self.closed: return
+        self._flush_chunk()
+        footer = dict(self.meta)
+        footer.update(meta)
+        footer.update({
+            'chunk_size': self.chunk_size,
+            'frames': self.frames,
+            'chunks': self.chunks,
+            'actions': actions or []
+        })
+        blob = zlib.compress(ujson.dumps(footer).encode('utf-8'), self.level)
+        offset = self._f.tell()
+        self._f.write(blob)
+        self._f.write(_TRAILER.pack(offset, len(blob), MAGIC))
+        self._f.close()
+        self._f = None
+
+
+class TrajectoryReader(object):
+    """Random access to the states stored in a ``.traj`` file.
+
+    ``source`` may be a filename, the raw bytes of a trajectory, or a seekable
+    binary file object (e.g., a member extracted from an archive).
+    """
+
+    def __init__(self, source: Union[str, bytes, io.IOBase]):
+        if isinstance(source, str):
+            self._f = open(source, 'rb')
+        elif isinstance(source, (bytes, bytearray)):
+            self._f = io.BytesIO(source)
+        else:
+            self._f = source
+        self._f.seek(0)
+        if self._f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a trajectory file: {}'.format(source))
+        self._cached_chunk = (None, [])
+        self.index = self._read_footer() or self._scan_chunks()
+        self.frames: List[int] = self.index['frames']
+        self.actions: List[str] = self.index['actions']
+        self.chunk_size: int = self.index['chunk_size']
+        self._frame_to_index = {fid: i for i, fid in enumerate(self.frames)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._f.close()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        return ujson.loads(self.raw(i))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.index.items() if k not in ('frames', 'chunks', 'actions', 'action_codes')}
+
+    def _read_footer(self) -> Optional[Dict[str, Any]]:
+        self._f.seek(0, os.SEEK_END)
+        end = self._f.tell()
+        if end < len(MAGIC) + _TRAILER.size: return None
+        self._f.seek(end - _TRAILER.size)
+        offset, length, magic = _TRAILER.unpack(self._f.read(_TRAILER.size))
+        if magic != MAGIC: return None
+        self._f.seek(offset)
+        return ujson.loads(zlib.decompress(self._f.read(length)).decode('utf-8'))
+
+    def _scan_chunks(self) -> Dict[str, Any]:
+        # The footer is missing, so the writer did not finish (e.g., the run was
+        # killed). Recover every complete chunk; frame ids are not recoverable.
+        chunks = []
+        self._f.seek(len(MAGIC))
+        while True:
+            offset = self._f.tell()
+            header = self._f.read(_CHUNK_HEADER.size)
+            if len(header) < _CHUNK_HEADER.size: break
+            length, count = _CHUNK_HEADER.unpack(header)
+            if len(self._f.read(length)) < length: break
+            chunks.append([offset, length, count])
+        nrecords = sum(c[2] for c in chunks)
+        return {
+            'chunk_size': chunks[0][2] if chunks else 1,
+            'frames': list(range(1, nrecords + 1)),
+            'chunks': chunks,
+            'actions': []
+        }
+
+    def _chunk(self, c: int) -> List[bytes]:
+        if self._cached_chunk[0] == c:
+            return self._cached_chunk[1]
+        offset, length, _ = self.index['chunks'][c]
+        self._f.seek(offset + _CHUNK_HEADER.size)
+        blob = zlib.decompress(self._f.read(length))
+        records = []
+        pos = 0
+        while pos < len(blob):
+            (n,) = _RECORD_HEADER.unpack_from(blob, pos)
+            pos += _RECORD_HEADER.size
+            records.append(blob[pos:pos + n])
+            pos += n
+        self._cached_chunk = (c, records)
+        return records
+
+    def raw(self, i: int) -> bytes:
+        """Returns the encoded state JSON for the ``i``th record."""
+        if i < 0: i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._chunk(i // self.chunk_size)[i % self.chunk_size]
+
+    def frame(self, frame_id: int) -> Dict[str, Any]:
+        """Returns the state recorded for frame number ``frame_id``."""
+        return self[self._frame_to_index[frame_id]]
+
+    def filename(self, i: int) -> str:
+        """The name this record would have had as a per-frame json file."""
+        return self.index.get('agent', '') + str(self.frames[i]).zfill(5) + '.json'
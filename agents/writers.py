@@ -0,0 +1,77 @@
+"""Background output for agent runs.
+
+``Agent.play`` only has to snapshot the state and the frame buffer; PNG
+encoding and JSON serialization happen on a small pool of writer threads.
+"""
+import queue
+import threading
+
+from typing import Any, Callable, Dict
+
+from PIL import Image
+
+try:
+    import ujson
+except:
+    import json as ujson
+
+
+def write_png(filename: str, rgba_frame):
+    Image.fromarray(rgba_frame, 'RGBA').save(filename, format='png')
+
+
+def write_json(filename: str, state: Dict[str, Any]):
+    with open(filename, 'w') as f:
+        ujson.dump(state, f)
+
+
+class AsyncWriter(object):
+    """A bounded queue of write jobs drained by ``workers`` threads.
+
+    ``submit`` blocks once ``maxsize`` jobs are pending, so a slow disk
+    applies back-pressure to the agent rather than growing memory without
+    bound. The first error raised by a job is re-raised by ``flush``.
+    """
+
+    def __init__(self, workers=2, maxsize=64):
+        self.workers = workers
+        self._queue : queue.Queue = queue.Queue(maxsize=maxsize)
+        self._error = None
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None: return
+                fn, args = job
+                fn(*args)
+            except Exception as e:
+                if self._error is None: self._error = e
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn: Callable, *args):
+        if not self._threads:
+            raise ValueError('Cannot submit to a closed writer.')
+        self._queue.put((fn, args))
+
+    def flush(self):
+        """Blocks until every submitted job has been written."""
+        self._queue.join()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def close(self):
+        if not self._threads: return
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
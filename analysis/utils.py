@@ -10,6 +10,9 @@ from collections import defaultdict
 from tqdm import tqdm
 import typing
 
+from agents.actionlog import read_action_log, code_to_string, EXTENSION as ACTION_LOG_EXTENSION
+from agents.trajectory import TrajectoryReader, EXTENSION as TRAJECTORY_EXTENSION
+
 def load_data(archive, load_state=False, load_images=False):
     if not (load_data or load_state):
         raise ValueError('Need to load at least one of load_state or load_images')
@@ -65,6 +68,18 @@ def load_data(archive, load_state=False, load_images=False):
             elif filename.endswith('png'):
                 if load_images:
                     images[agent][seed].append((filename, imageio.read(extracted, format='png', pilmode='RGBA')))
+            elif filename.endswith(TRAJECTORY_EXTENSION):
+                if load_state:
+                    with TrajectoryReader(extracted.read()) as reader:
+                        states[agent][seed].extend((reader.filename(i), reader[i]) for i in range(len(reader)))
+                        if seed not in actions[agent] and reader.actions:
+                            a = [(str(i + 1).zfill(5), (action + '\n').encode('utf-8')) for (i, action) in enumerate(reader.actions)]
+                            actions[agent][seed] = a + [(str(len(a) + 1).zfill(5), '')]
+            elif filename.endswith(ACTION_LOG_EXTENSION):
+                if load_state:
+                    log = read_action_log(extracted.read())
+                    a = [(str(i + 1).zfill(5), (code_to_string(int(c), log.encoding) + '\n').encode('utf-8')) for (i, c) in enumerate(log.codes)]
+                    actions[agent][seed] = a + [(str(len(a) + 1).zfill(5), '')]
             elif filename.endswith('act'):
                 if load_state:
                     a = [(str(i + 1).zfill(5), action) for (i, action) in enumerate(extracted.readlines())]
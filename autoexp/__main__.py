@@ -5,6 +5,7 @@ For information, use with argument --help.
 import argparse
 import importlib
 import os
+import random
 import sys
 
 from timeit import default_timer as timer
@@ -92,6 +93,7 @@ counterfactual = eval('outcomes.' + args.game + '.' + args.counterfactual[0])(*a
 
 agent_mod = '.'.join(['agents', args.game, args.agent[0].lower()])
 importlib.import_module(agent_mod)
+random.seed(args.seed)
 tb = Toybox(args.game, seed=args.seed)
 arglist = []
 kwargs = {}
@@ -9,7 +9,7 @@ from random import randrange
 from tabulate import tabulate
 from typing import List, Dict, Tuple, Any, Union, Set
 
-from ctoybox import Toybox, Input
+from ctoybox import Toybox
 from toybox.interventions import get_intervener, get_state_object
 from toybox.interventions.core import Game, get_property, parse_property_access
 from toybox.interventions.base import BaseMixin, Collection, SetEq
@@ -22,9 +22,11 @@ from .vars.atomic import get_core_vars
 
 
 try: 
-  from ..agents.base import Agents, action_to_string, string_to_input
+  from ..agents.base import Agents, action_to_string, string_to_input, action_code, apply_action_code
+  from ..agents.lazy import LazyState
 except:
-  from agents.base import Agent, action_to_string, string_to_input
+  from agents.base import Agent, action_to_string, string_to_input, action_code, apply_action_code
+  from agents.lazy import LazyState
 
 import logging
 import math
@@ -68,6 +70,8 @@ class Trace(object):
     self.full = trace
     self.outcome_state = trace[-1][0]
     self._trace = trace[:-1]
+    # Each state of _trace encoded once, as JSON; copies are decoded from these on demand.
+    self._encoded : List[str] = [json.dumps(t[0].encode()) for t in self._trace]
 
   def __len__(self):
     return len(self.full)
@@ -75,27 +79,29 @@ class Trace(object):
   def __getitem__(self, i):
     return self.full[i]
 
-  def get_state_trace(self) -> List[Game]:
+  def decode_state(self, intervener, i: int) -> Game:
+    """A fresh copy of state ``i`` of the trace (without its outcome state), bound to ``intervener``."""
     game = get_state_object(self.game_name)
+    return game.decode(intervener, json.loads(self._encoded[i]), game)
+
+  def get_state_trace(self) -> List[Game]:
     intervener = get_intervener(self.game_name)
     with Toybox(self.game_name, seed=self.seed) as tb:
       with intervener(tb, modelmod=self.modelmod, eq_mode=SetEq) as i:
         # make fresh objects
-        return [game.decode(i, t[0].encode(), game) for t in self._trace]
+        return [self.decode_state(i, j) for j in range(len(self._encoded))]
 
   def get_trace(self) -> List[Tuple[Game, str]]:
-    game = get_state_object(self.game_name)
     intervener = get_intervener(self.game_name)
     with Toybox(self.game_name, seed=self.seed) as tb:
       with intervener(tb, modelmod=self.modelmod, eq_mode=SetEq) as i:
         # make fresh objects
-        return [(game.decode(i, t.encode(), game), a) for t, a in self._trace]
+        return [(self.decode_state(i, j), a) for j, (_, a) in enumerate(self._trace)]
 
   def get_intervention_state(self, tb: Toybox, timelag: int) -> Game:
     """Returns a fresh copy of the intervention state."""
-    game = get_state_object(self.game_name)
     intervener = get_intervener(self.game_name)(tb, modelmod=self.modelmod, eq_mode=SetEq)
-    return game.decode(intervener, self.get_state_trace()[timelag].encode(), game)
+    return self.decode_state(intervener, timelag)
 
 
 class Result(object):
@@ -332,7 +338,7 @@ class Experiment(object):
     return diff1, diff2
 
 
-  def run_control(self, game, intervention, prop, after, control_state, record=False) -> List[Game]:
+  def run_control(self, game, intervention, prop, after, control_state, record=False) -> List[LazyState]:
 
     if record:
       d = self.outdir + os.sep + 'control' + os.sep + str(prop) + os.sep + str(after)
@@ -346,22 +352,15 @@ class Experiment(object):
           json.dump(tb.state_to_json(), js)
         tb.save_frame_image(f + '00001.png')
 
-      for i, action in enumerate(self.agent.actions, start=2):
+      codes = [action_code(action) for action in self.agent.actions]
+      for i, code in enumerate(codes, start=2):
         if record:
           with open(f + str(i).zfill(5) + '.json' , 'w') as js:
             json.dump(tb.state_to_json(), js)
           tb.save_frame_image(f + str(i).zfill(5) + '.png')
 
-        if isinstance(action, Input):
-          tb.apply_action(action)
-        elif type(action) == int:
-          tb.apply_ale_action(action)
-        elif action is None:
-          pass
-        else:
-          raise ValueError('Unknown action type:', type(action))
-
-        states.append(game.decode(intervention, tb.state_to_json(), game))
+        apply_action_code(tb, code)
+        states.append(LazyState(self.game_name, tb.state_to_json(), intervention))
     return states      
 
 
@@ -372,9 +371,12 @@ class Experiment(object):
     s = self.trace.get_intervention_state(self.agent.toybox, self.timelag)
     factuals = 1
     counterfactuals = 0
+    # Every branch sees the same random draws, so only the first action differs.
+    rng_state = self.agent.get_rng_state()
   
     for action in actions:
       self.agent.reset()
+      self.agent.set_rng_state(rng_state)
       self.agent.toybox.write_state_json(s.encode())
       self.agent.toybox.apply_ale_action(action)
       self.agent.play('forward_simulate', maxsteps=t, save_states=True)
@@ -443,7 +445,7 @@ class Experiment(object):
 
         game         = get_state_object(self.game_name)
         intervention = get_intervener(self.game_name)(self.agent.toybox, self.game_name, eq_mode=SetEq)
-        s1           = game.decode(intervention, self.get_intervention_state(intervention.toybox).encode(), game)
+        s1           = self.trace.decode_state(intervention, self.timelag)
 
         try:
           s1_, prop, after = self.generate_intervention(intervention.toybox)
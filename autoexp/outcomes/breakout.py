@@ -8,7 +8,8 @@ from toybox.interventions.breakout import Breakout
 from toybox.envs.atari.base import ACTION_MEANING
 
 from . import *
-from agents.base import action_to_string
+from agents.base import action_code, HORIZONTAL_MOVE
+from agents.breakout.predict import predict_state, walls
 
 class StagnantBall(OutcomeException):
 
@@ -159,14 +160,10 @@ class MoveSame(Outcome):
         # outcome for that context.
         if ball_dir is None or ball_dir == 0: return False
     
+        ball_sign = 1 if ball_dir > 0 else -1
         for s1, s2, a in zip(prevs, states, actions):
-          a = action_to_string(a)
-
           if len(s1.balls) and len(s2.balls):
-            if ball_dir > 0: # ball is moving right
-              if a.upper().strip() == 'RIGHT': same_dir += 1
-            elif ball_dir < 0:
-              if a.upper().strip() == 'LEFT': same_dir += 1  
+            if HORIZONTAL_MOVE[action_code(a)] == ball_sign: same_dir += 1
         return same_dir > (len(pairs) / 2.)
 
 
@@ -193,14 +190,10 @@ class MoveOpposite(Outcome):
     
     if ball_dir is None or ball_dir == 0: return False
     
+    ball_sign = 1 if ball_dir > 0 else -1
     for s1, s2, a in zip(prevs, states, actions):
-      a = action_to_string(a)
-
       if len(s1.balls) and len(s2.balls):
-        if ball_dir > 0: # ball is moving right
-          if a.upper().strip() == 'LEFT': against_dir += 1
-        elif ball_dir < 0:
-          if a.upper().strip() == 'RIGHT': against_dir += 1  
+        if HORIZONTAL_MOVE[action_code(a)] == -ball_sign: against_dir += 1
     return against_dir > (len(pairs) / 2.)
 
 
@@ -260,14 +253,28 @@ class MoveToward(Outcome):
 
 
 class Aim(Outcome):
-    """An agent is aiming if the region of interest of the paddle remains within some epsilon of the ball's x position."""
+    """An agent is aiming if the region of interest of the paddle remains within some epsilon of the ball's x position.
 
-    def __init__(self, location):
+    With ``predicted``, the paddle is compared against where a falling ball
+    will cross the paddle line instead of where the ball is now.
+    """
+
+    def __init__(self, location, predicted=False):
         super().__init__(2)
         self.location = location
+        self.predicted = predicted
+        self._walls = None
 
     def __str__(self):
-        return self.__class__.__name__ + self.location.capitalize()
+        return self.__class__.__name__ + self.location.capitalize() + ('Predicted' if self.predicted else '')
+
+    def target_x(self, state):
+        if not self.predicted:
+            return state.balls[0].position.x
+        if self._walls is None:
+            self._walls = walls(state.bricks)
+        crossing = predict_state(state, self._walls)
+        return crossing.x if crossing else state.balls[0].position.x
 
     def compute_center(self, state):
         if self.location == 'up':
@@ -285,8 +292,7 @@ class Aim(Outcome):
             if not len(s.balls): continue
             eps = s.paddle_width / 4.
             paddle_center = self.compute_center(s)
-            ballx = s.balls[0].position.x
-            diff = abs(paddle_center - ballx)
+            diff = abs(paddle_center - self.target_x(s))
             if diff > eps: return False
         return True
 
@@ -1,29 +1,38 @@
-import json
 import os
 
 from typing import List, Tuple, Union
 
 from ctoybox import Toybox, Input
-from toybox.interventions import Game, get_state_object, get_intervener
+from toybox.interventions import Game, get_intervener
+
+from agents.lazy import LazyState, materialize
+from agents.replay import Replay, EXTENSION as REPLAY_EXTENSION
+from agents.trajectory import TrajectoryReader, EXTENSION as TRAJECTORY_EXTENSION
 
 from .outcomes import Outcome
 
-def load_states(datadir: str, game:str) -> List[Game]:
-  states : List[Game] = []
+def load_states(datadir: str, game:str) -> List[LazyState]:
+  """Loads every recorded state in datadir; states are only decoded into Game objects on demand."""
+  states : List[LazyState] = []
   with Toybox(game) as tb:
+    i = get_intervener(game)(tb, game)
     for f in os.listdir(datadir):
       if f.endswith('json'):
         with open(datadir + os.sep + f, 'r') as state:
-          g : Game = get_state_object(game)
-          i = get_intervener(game)(tb, game)
-          states.append(g.decode(i, json.load(state), g))
+          states.append(LazyState(game, state.read(), i))
+      elif f.endswith(TRAJECTORY_EXTENSION):
+        with TrajectoryReader(datadir + os.sep + f) as reader:
+          states.extend(LazyState(game, reader.raw(j), i) for j in range(len(reader)))
+      elif f.endswith(REPLAY_EXTENSION):
+        with Replay(datadir + os.sep + f) as replay:
+          states.extend(LazyState(game, js, i) for js in replay)
   return states  
 
 
 def learn_models(states: List[Game], modelmod:str, game: str):
   intervener = get_intervener(game)
   with Toybox(game) as tb:  
-    with intervener(tb, modelmod=modelmod, data=states): 
+    with intervener(tb, modelmod=modelmod, data=[materialize(s) for s in states]): 
       pass # this should just make the model
 
 
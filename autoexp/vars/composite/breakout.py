@@ -5,6 +5,8 @@ from toybox.interventions import Game
 from toybox.interventions.core import distr, get_property
 from toybox.interventions.breakout import BreakoutIntervention
 
+from agents.breakout.columns import BrickColumnIndex
+
 import importlib
 import random
 import math
@@ -134,17 +136,21 @@ class BoardConfig(Composite):
       with BreakoutIntervention(tb) as intervention:
         bricks = intervention.game.bricks
         self.atomicvars = ['bricks[{}].alive'.format(i) for i in range(len(bricks))]
+        self.index = BrickColumnIndex(tb.state_to_json()['bricks'])
 
   def get(self, g:Game):
-    return sum([2**i for i, brick in enumerate(g.bricks) if brick.alive])
+    # Consecutive calls mostly see the same board, so only changed bricks are re-counted.
+    bricks = g.bricks
+    if not self.index.fits(bricks):
+      self.index = BrickColumnIndex(g.encode()['bricks'])
+    self.index.update([brick.alive for brick in bricks])
+    return self.index.alive_mask
 
   def set(self, v:int, g:Game):
-    counter = 0
-    shifted = v
-    while counter < len(g.bricks):
-      get_property(g, 'bricks[{}].alive'.format(counter), setval=bool(shifted != (shifted >> 1 << 1)))
-      shifted >>= 1
-      counter += 1    
+    for i, brick in enumerate(g.bricks):
+      alive = bool(v >> i & 1)
+      if brick.alive != alive:
+        brick.alive = alive
   
   def sample(self, g:Game):
     before = self.get(g)
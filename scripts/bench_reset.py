@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Times a deep agent's reset, keeping its TensorFlow session and replacing it.
+
+Experiment.compute_frequency resets the agent once per repetition and
+in_critical_period once per legal action, so reset latency multiplies. Each
+timing covers the reset and the first get_action after it, so costs the
+session defers to its first run are counted too.
+
+    python scripts/bench_reset.py --game breakout --agentclass PPO2 --reps 100
+"""
+import argparse
+import statistics
+
+from timeit import default_timer as timer
+
+from ctoybox import Toybox
+
+from agents.pool import make_agent
+
+
+def time_resets(agent, reps, fresh_session):
+    times = []
+    for _ in range(reps):
+        start = timer()
+        agent.reset(fresh_session=fresh_session)
+        agent.get_action()
+        times.append(timer() - start)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time deep agent resets with and without a new TensorFlow session.')
+    parser.add_argument('--game',       default='breakout')
+    parser.add_argument('--agentclass', default='PPO2')
+    parser.add_argument('--seed',       default=1234, type=int)
+    parser.add_argument('--reps',       default=100, type=int)
+    args = parser.parse_args()
+
+    with Toybox(args.game) as tb:
+        agent = make_agent(args.game, args.agentclass, args.seed, tb)
+        for label, fresh_session in [('new session (before)', True), ('kept session (after)', False)]:
+            times = time_resets(agent, args.reps, fresh_session)
+            print('{:22} mean {:8.2f} ms  median {:8.2f} ms  total {:7.2f} s'.format(
+                label, 1000 * statistics.mean(times), 1000 * statistics.median(times), sum(times)))
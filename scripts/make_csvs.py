@@ -6,14 +6,53 @@ import math
 from tqdm import tqdm
 import ujson as json
 import toybox.interventions.breakout as breakout
-from collections import namedtuple
 from ctoybox import Toybox
+from agents.actionlog import read_action_log, code_to_string, EXTENSION as ACTION_LOG_EXTENSION
+from agents.breakout.columns import BrickColumnIndex
+from agents.lazy import LazyState
+from agents.replay import Replay, find_replay
+from agents.trajectory import TrajectoryReader, find_trajectory
+
+def load_run(this_dir, agent):
+    """Returns the actions and a (t, raw state json) iterator for one seed's output directory."""
+    trajectory = find_trajectory(this_dir)
+    if trajectory:
+        reader = TrajectoryReader(trajectory)
+        actions = [a + '\n' for a in reader.actions]
+        def states():
+            with reader:
+                for i in range(len(reader)):
+                    yield reader.frames[i], reader.raw(i)
+        return actions, states()
+
+    replay = find_replay(this_dir)
+    if replay:
+        replay = Replay(replay)
+        actions = [a + '\n' for a in replay.actions]
+        def states():
+            with replay:
+                for k in range(len(replay)):
+                    yield replay.frame_id(k), replay.raw(k)
+        return actions, states()
+
+    action_log = this_dir + os.sep + agent + ACTION_LOG_EXTENSION
+    if os.path.exists(action_log):
+        log = read_action_log(action_log)
+        actions = [code_to_string(int(c), log.encoding) + '\n' for c in log.codes]
+    else:
+        with open(this_dir + os.sep + agent + '.act', 'r') as action_file:
+            actions = action_file.readlines()
+
+    def states():
+        for f in sorted(os.listdir(this_dir)):
+            if not f.endswith('json'): continue
+            with open(this_dir + os.sep + f, 'r') as state_file:
+                yield int(f[-10:-5]), state_file.read()
+    return actions, states()
 
 def run(args):
-    query = breakout.BreakoutIntervention(namedtuple('tb', 'game_name')('breakout'), 'breakout')
     with Toybox('breakout') as tb:
         config = tb.config_to_json()
-        query.config = config 
 
     with open(args.outdir + os.sep + args.agent + '.csv', 'w') as outfile:
 
@@ -50,24 +89,19 @@ def run(args):
         for seed in tqdm(os.listdir(args.outdir + os.sep + args.agent)):
             this_dir = args.outdir + os.sep + args.agent + os.sep + seed
 
-            
-            with open(this_dir + os.sep + args.agent + '.act', 'r') as action_file:
-                actions = action_file.readlines()
-
+            actions, states = load_run(this_dir, args.agent)
 
             prev_state = None
             prev_t = 0
+            index = None
             timesteps_this_seed = []
 
-            for f in sorted(os.listdir(this_dir)):
-                if not f.endswith('json'): continue
-                t = int(f[-10:-5])
+            for t, js in states:
                 # Frames are 1-indexed.
                 assert t != 0 
                 assert t == prev_t + 1
-                with open(this_dir + os.sep + f, 'r') as state_file:
-                    state = breakout.Breakout.decode(None, json.load(state_file), breakout.Breakout)
-                query.game = state
+                # Only the fields read below are ever touched, so skip Game.decode.
+                state = LazyState('breakout', js)
                 if t == 1:
                     initial_paddle_width = state.paddle_width
                 record = [args.agent, seed, t]
@@ -106,18 +140,15 @@ def run(args):
                 # 0 to 2^18-1 or 18 variables that range from 0 to 6. 
                 # Solution: punt on this and just return a single number that encodes
                 # the whole board.
-                board_alive = 0
-                nrows = query.num_rows()
-                ncols = query.num_columns()
-                for i in range(ncols):
-                    for j, brick in enumerate(query.get_column(i)):
-                        if brick.alive:
-                            board_alive += 2**(i*nrows + j)
-                record.append(board_alive)
+                bricks = state.json()['bricks']
+                if index is None or not index.fits(bricks):
+                    index = BrickColumnIndex(bricks)
+                index.update([brick['alive'] for brick in bricks])
+                record.append(index.board_alive)
                 
                 # Record whether the paddle is on the far left or far right of the screen
-                leftmost_brick = query.get_column(0)[0]
-                rightmost_brick = query.get_column(query.num_columns() - 1)[0]
+                leftmost_brick = state.bricks[index.columns[0][0]]
+                rightmost_brick = state.bricks[index.columns[-1][0]]
                 
                 record.append(paddle_pos.x <= (leftmost_brick.position.x - (leftmost_brick.size.x * 0.5)))
                 record.append(paddle_pos.x >= (rightmost_brick.position.x + (rightmost_brick.size.x * 0.5)))
@@ -145,7 +176,7 @@ def run(args):
                 record.append(math.sqrt((ball_pos.x - paddle_pos.x)**2 + (ball_pos.y - paddle_pos.y)**2) if ball_pos else None)
                 
                 # Total bricks left
-                record.append(sum(int(b.alive) for b in state.bricks))
+                record.append(index.num_alive)
                 timesteps_this_seed.append(record)
                 prev_t = t
                 prev_state = state
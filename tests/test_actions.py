@@ -0,0 +1,40 @@
+"""The action codec in agents.base."""
+import pickle
+
+import pytest
+
+pytest.importorskip('ctoybox')
+pytest.importorskip('toybox')
+
+from agents.base import INPUTS, LEFT, NO_ACTION, NOOP, HORIZONTAL_MOVE, action_code, action_to_string
+
+
+def test_shared_inputs_are_frozen():
+    shared = INPUTS[LEFT]
+    with pytest.raises(AttributeError):
+        shared.right = True
+    with pytest.raises(AttributeError):
+        shared.reset()
+    assert not INPUTS[LEFT].right and INPUTS[LEFT].left
+
+    copy = shared.thaw()
+    copy.right = True
+    assert copy.left and copy.right
+    assert action_code(copy) == LEFT | action_code(INPUTS[action_code('right')])
+    assert pickle.loads(pickle.dumps(shared)).left
+
+
+# Logged actions as the outcome predicates saw them: action_to_string(a).upper().strip() == 'LEFT'/'RIGHT'.
+LOGGED = ['left', 'Left', ' LEFT ', 'right', 'RIGHT', 'Right\n', 'noop', 'NOOP', 'Noop', '', 'up', 'fire',
+          'UPLEFT', 'RIGHTFIRE', 'rightfire', 'sideways', 'NoSuchAction']
+
+
+@pytest.mark.parametrize('logged', LOGGED)
+def test_logged_strings_move_as_before(logged):
+    before = {'LEFT': -1, 'RIGHT': 1}.get(action_to_string(logged).upper().strip(), 0)
+    assert HORIZONTAL_MOVE[action_code(logged)] == before
+
+
+def test_unknown_strings_are_no_action():
+    assert action_code('sideways') == NO_ACTION
+    assert action_code('noop') == action_code('NoOp') == NOOP
@@ -0,0 +1,49 @@
+"""Recorded states after they leave StateHistory's cache."""
+import pytest
+
+pytest.importorskip('ctoybox')
+pytest.importorskip('toybox')
+
+from ctoybox import Input, Toybox
+
+from agents.history import StateHistory
+
+
+def played_history(tb, frames=10, **kwargs) -> StateHistory:
+    history = StateHistory(tb, **kwargs)
+    for _ in range(frames):
+        history.append(tb.state_to_json())
+        tb.apply_action(Input())
+    return history
+
+
+def test_changed_state_survives_eviction():
+    with Toybox('breakout') as tb:
+        history = played_history(tb, keyframe_interval=4, cache_size=2)
+        state = history[0]
+        state.score = 1234
+        for i in range(1, len(history)):
+            history[i]
+        assert history[0] is state
+        assert history[0].score == 1234
+
+
+def test_unchanged_states_are_evicted():
+    with Toybox('breakout') as tb:
+        history = played_history(tb, keyframe_interval=4, cache_size=2)
+        first = history[0]
+        for i in range(1, len(history)):
+            history[i]
+        again = history[0]
+        assert again is not first
+        assert again.encode() == first.encode()
+
+
+def test_states_have_their_own_intervention():
+    with Toybox('breakout') as tb:
+        history = played_history(tb, cache_size=2)
+        a, b = history[1], history[2]
+        assert a.intervention is not b.intervention
+        for i in range(3, len(history)):
+            history[i]
+        assert history[1].intervention is a.intervention
@@ -0,0 +1,26 @@
+"""Comparing states and JSON views without decoding them."""
+import json
+
+import pytest
+
+pytest.importorskip('toybox')
+
+from agents.lazy import JsonList, JsonView, LazyState
+
+STATE = {'score': 3, 'balls': [{'position': {'x': 1.0, 'y': 2.0}}]}
+
+
+def test_undecoded_states_compare_by_json():
+    a = LazyState('breakout', json.dumps(STATE))
+    b = LazyState('breakout', json.loads(json.dumps(STATE)))
+    c = LazyState('breakout', dict(STATE, score=4))
+    assert a == b and not a != b
+    assert a != c and not a == c
+    assert not (a.decoded or b.decoded or c.decoded)
+
+
+def test_views_compare_by_json():
+    a, b = JsonView(json.loads(json.dumps(STATE))), JsonView(json.loads(json.dumps(STATE)))
+    assert a == b and not a != b
+    assert a.balls == b.balls and isinstance(a.balls, JsonList)
+    assert a.balls[0].position != JsonView({'x': 1.0, 'y': 3.0})
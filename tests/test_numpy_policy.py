@@ -0,0 +1,67 @@
+"""NumpyPolicy against the models it is exported from (see agents.numpy_policy)."""
+import os
+
+import numpy
+import pytest
+
+from agents.numpy_policy import NumpyPolicy, export, verify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (library, family, model path relative to the repository, env id)
+MODELS = [
+    ('baselines', 'ppo2', 'agents/data/BreakoutToyboxNoFrameskip-v4.regress.model', 'BreakoutToyboxNoFrameskip-v4'),
+    ('baselines', 'ppo2', 'data/AmidarToyboxNoFrameskip-v4.regress', 'AmidarToyboxNoFrameskip-v4'),
+    ('stable_baselines3', 'A2C', 'data/stablebaselines_a2c_amidar_1e4.regress.zip', None),
+]
+LIBRARY_IMPORTS = {
+    'baselines': ['tensorflow', 'baselines', 'toybox'],
+    'stable_baselines3': ['torch', 'stable_baselines3', 'toybox'],
+}
+
+
+def random_weights(rng, channels=4, actions=6):
+    """Nature CNN weights in NumpyPolicy's layout."""
+    shapes = {'c1/w': (8, 8, channels, 32), 'c2/w': (4, 4, 32, 64), 'c3/w': (3, 3, 64, 64),
+              'fc1/w': (7 * 7 * 64, 512), 'pi/w': (512, actions), 'vf/w': (512, 1)}
+    weights = {}
+    for name, shape in shapes.items():
+        weights[name] = rng.normal(scale=0.05, size=shape)
+        weights[name[:-1] + 'b'] = rng.normal(scale=0.05, size=shape[-1])
+    return weights
+
+
+def test_single_observation():
+    rng = numpy.random.RandomState(0)
+    policy = NumpyPolicy(random_weights(rng))
+    obs = rng.randint(0, 256, size=(3, 84, 84, 4)).astype(numpy.uint8)
+
+    actions, _ = policy.predict(obs, deterministic=True)
+    assert actions.shape == (3,)
+    for i in range(len(obs)):
+        action, _ = policy.predict(obs[i], deterministic=True)
+        assert numpy.ndim(action) == 0 and action == actions[i]
+
+    action, value, state, neglogp = policy.step(obs[0])
+    assert numpy.ndim(action) == 0 and numpy.ndim(value) == 0 and numpy.ndim(neglogp) == 0 and state is None
+
+
+@pytest.mark.parametrize('library,family,model_path,env_id', MODELS)
+def test_matches_original(library, family, model_path, env_id, tmp_path):
+    for module in LIBRARY_IMPORTS[library]:
+        pytest.importorskip(module)
+    model_path = os.path.join(ROOT, model_path)
+    if not os.path.exists(model_path):
+        pytest.skip('no model at ' + model_path)
+
+    if library == 'baselines':
+        import tensorflow as tf
+        # Load the original twice (export, then verify) without their variables meeting.
+        with tf.Graph().as_default():
+            weights = export(library, family, model_path, env_id, str(tmp_path / 'weights.npz'))
+        with tf.Graph().as_default():
+            diff = verify(library, family, model_path, env_id, weights)
+    else:
+        weights = export(library, family, model_path, env_id, str(tmp_path / 'weights.npz'))
+        diff = verify(library, family, model_path, env_id, weights)
+    assert diff <= 1e-4
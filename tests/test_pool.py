@@ -0,0 +1,57 @@
+"""Building agents the way the pool, agents.batch and ``python -m agents`` do."""
+import importlib
+import inspect
+import pkgutil
+
+import pytest
+
+pytest.importorskip('ctoybox')
+pytest.importorskip('toybox')
+
+from agents.base import Agent
+from agents.pool import AgentPool, make_agent
+
+GAMES = ['breakout', 'amidar']
+
+
+def agent_modules():
+    """(game, module) of every module make_agent may look an agent class up in."""
+    return [(game, info.name)
+            for game in GAMES
+            for info in pkgutil.iter_modules(importlib.import_module('agents.' + game).__path__)]
+
+
+def agent_class(game, module_name):
+    """The class make_agent builds from ``agents/<game>/<module_name>.py``, or None."""
+    try:
+        module = importlib.import_module('agents.' + game + '.' + module_name)
+    except ImportError as e:
+        # Deep agents need tensorflow and baselines.
+        pytest.skip(str(e))
+    for name, cls in vars(module).items():
+        if (name.lower() == module_name and inspect.isclass(cls) and issubclass(cls, Agent)
+                and not inspect.isabstract(cls)):
+            return cls
+    return None
+
+
+@pytest.mark.parametrize('game,module_name', agent_modules())
+def test_make_agent_with_seed(game, module_name):
+    cls = agent_class(game, module_name)
+    if cls is None:
+        pytest.skip('no agent class in agents.{}.{}'.format(game, module_name))
+    agent = make_agent(game, cls.__name__, 7)
+    try:
+        assert isinstance(agent, cls)
+        assert agent.seed == 7
+    finally:
+        agent.toybox.__exit__(None, None, None)
+
+
+@pytest.mark.parametrize('game,module_name', agent_modules())
+def test_pool_from_seeds(game, module_name):
+    cls = agent_class(game, module_name)
+    if cls is None:
+        pytest.skip('no agent class in agents.{}.{}'.format(game, module_name))
+    with AgentPool.from_seeds(game, [cls.__name__], [3, 4]) as pool:
+        assert [agent.seed for agent in pool.agents] == [3, 4]